@@ -0,0 +1,86 @@
+from collections import namedtuple
+from collections.abc import Iterator
+
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR
+
+AccrualResult = namedtuple('AccrualResult', [
+    'elapsed',          # seconds covered by the series
+    'borrow_index',     # final borrow index (starts at 1)
+    'supply_index',     # final supply index (starts at 1)
+    'reserves',         # reserves accrued per unit of initial supply
+    'borrow_apy',       # realized borrow APY (%)
+    'supply_apy',       # realized supplier APY (%)
+    'history',          # dict of arrays sampled every `record_every` steps
+])
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def _chunks(utilization, dt, chunk_size):
+    # Only iterators (generators included) hold chunks; lists, Series and the like are one series
+    if not isinstance(utilization, Iterator):
+        utilization = np.atleast_1d(np.asarray(utilization, dtype=float))
+        for start in range(0, len(utilization), chunk_size):
+            part = slice(start, start + chunk_size)
+            yield utilization[part], dt[part] if np.ndim(dt) else dt
+        return
+    for chunk in utilization:
+        if isinstance(chunk, tuple):
+            yield chunk
+        else:
+            yield chunk, dt
+
+
+def simulate_accrual(model, utilization, dt=1.0, chunk_size=DEFAULT_CHUNK_SIZE, record_every=None):
+    """Compound interest for a `RateModel` along a utilization series.
+
+    `utilization` (percent) is array-like (a list, a pandas Series or an
+    array, possibly memory-mapped) or an iterator, such as a generator, of
+    chunks; chunks may be `(utilization, dt)` pairs for series with
+    irregular block times.  `dt` is the step length in seconds, a scalar
+    or an array aligned with `utilization`.  Each step applies the rates at
+    the start of the step, so the indices grow by `1 + rate / 100 * dt`.
+    Only `chunk_size` steps are held in memory at once; `record_every`
+    keeps every n-th point of the index paths in `history`.
+    """
+    log_borrow = log_supply = 0.0
+    reserves = 0.0
+    elapsed = 0.0
+    steps = 0
+    history = {'time': [], 'borrow_index': [], 'supply_index': [], 'reserves': []}
+
+    for chunk, chunk_dt in _chunks(utilization, dt, chunk_size):
+        chunk = np.asarray(chunk, dtype=float)
+        if not len(chunk):
+            continue
+        chunk_dt = np.broadcast_to(np.asarray(chunk_dt, dtype=float), chunk.shape)
+        borrow_rates, supply_rates = model.rates(chunk)
+
+        borrow_growth = np.cumsum(np.log1p(borrow_rates / 100 * chunk_dt)) + log_borrow
+        supply_growth = np.cumsum(np.log1p(supply_rates / 100 * chunk_dt)) + log_supply
+
+        # Supply balance at the start of each step, per unit of initial supply
+        supply_balance = np.exp(np.concatenate(([log_supply], supply_growth[:-1])))
+        spread = (borrow_rates * chunk / 100 - supply_rates) / 100 * chunk_dt
+        reserve_path = np.cumsum(supply_balance * spread) + reserves
+        time = np.cumsum(chunk_dt) + elapsed
+
+        if record_every:
+            picks = np.arange((-steps - 1) % record_every, len(chunk), record_every)
+            history['time'].append(time[picks])
+            history['borrow_index'].append(np.exp(borrow_growth[picks]))
+            history['supply_index'].append(np.exp(supply_growth[picks]))
+            history['reserves'].append(reserve_path[picks])
+
+        log_borrow, log_supply = borrow_growth[-1], supply_growth[-1]
+        reserves, elapsed = reserve_path[-1], time[-1]
+        steps += len(chunk)
+
+    history = {key: np.concatenate(values) if values else np.empty(0) for key, values in history.items()}
+    years = elapsed / SECONDS_PER_YEAR if elapsed else np.nan
+    borrow_apy = np.expm1(log_borrow / years) * 100
+    supply_apy = np.expm1(log_supply / years) * 100
+    return AccrualResult(elapsed, np.exp(log_borrow), np.exp(log_supply), reserves,
+                         borrow_apy, supply_apy, history)
@@ -0,0 +1,162 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from rate_engine import RateModel
+from sampling import jump_rate_curves
+
+GRID_SIZES = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Defaults of the three Tk apps
+MODELS = {
+    '2-slope': RateModel.jump_rate(0, 1.585489599e-9, 3.4563673262e-8, 80.0, 5.0),
+    '3-slope': RateModel.double_jump_rate(0, 0, 1.585489599e-9, 3.4563673262e-8, 5.0, 85.0, 5.0),
+    'separated': RateModel.separated(4.75646879e-8, 1.585489599e-9, 1.26839167935e-7,
+                                     0, 1.648909183e-9, 1.14155251141e-7, 90.0),
+}
+
+# base_rate, low_slope, reserve_factor, jump_slopes and kinks of the Streamlit 2-slope view
+STREAMLIT_DEFAULTS = (0.0, 1.93782062e-9, 10.0, (1.9e-7,), (90,))
+
+
+def timed(func, repeat=5, min_time=0.05):
+    """Best and median seconds per call, calibrating calls per repeat to last `min_time`."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed else 10
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {'best': min(samples), 'median': float(np.median(samples)), 'calls': number, 'repeat': repeat}
+
+
+def bench_curves(sizes, repeat):
+    results = {}
+    for size in sizes:
+        utilization = np.linspace(0, 100, size)
+        for name, model in MODELS.items():
+            results[f'curve/{name}/{size}'] = timed(lambda: model.rates(utilization), repeat)
+        results[f'curve/streamlit/{size}'] = timed(lambda: jump_rate_curves(*STREAMLIT_DEFAULTS, 'grid', size), repeat)
+    return results
+
+
+def bench_hover(repeat):
+    results = {}
+    points = np.random.default_rng(0).uniform(0, 100, 1_000_000)
+    for name, model in MODELS.items():
+        # One on_hover call, then a batch of a million readings
+        results[f'hover/{name}/point'] = timed(lambda: model.quote(63.7), repeat)
+        results[f'hover/{name}/batch-1000000'] = timed(lambda: model.quote(points), repeat)
+    return results
+
+
+def bench_redraw(sizes, repeat):
+    # Agg canvas driven through the same CurvePlot the Tk apps use
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from tk_plot import CurvePlot
+
+    results = {}
+    model = MODELS['2-slope']
+    for size in sizes:
+        figure = Figure(figsize=(5, 3))
+        canvas = FigureCanvasAgg(figure)
+        plot = CurvePlot(None, figure.add_subplot(), canvas, lambda sel: None)
+        utilization = np.linspace(0, 100, size)
+        plot.draw(utilization, *model.rates(utilization))
+
+        def redraw():
+            # draw_idle renders synchronously on a bare Agg canvas
+            borrow_rates, supply_rates = model.rates(utilization)
+            plot.draw(utilization, borrow_rates, supply_rates)
+
+        results[f'redraw/update_plot/{size}'] = timed(redraw, repeat)
+    return results
+
+
+def bench_slider(repeat):
+    from curve_cache import CurveCache, slider_table
+
+    results = {}
+    for name, model in MODELS.items():
+        # Building the whole 0-100% table once, then one drag step
+        results[f'slider/{name}/table'] = timed(lambda: slider_table(model, 0), repeat)
+        cache = CurveCache()
+        cache.slider_curves(model, 0)
+        results[f'slider/{name}/lookup'] = timed(lambda: cache.slider_curves(model, 0), repeat)
+    return results
+
+
+def run(max_points=GRID_SIZES[-1], redraw_max_points=100_000, repeat=5):
+    sizes = [size for size in GRID_SIZES if size <= max_points]
+    results = {}
+    results.update(bench_curves(sizes, repeat))
+    results.update(bench_hover(repeat))
+    results.update(bench_slider(repeat))
+    results.update(bench_redraw([size for size in sizes if size <= redraw_max_points], repeat))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Benchmarks whose median got slower than `tolerance` times the baseline."""
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if previous and result['median'] > previous['median'] * tolerance:
+            regressions.append((name, previous['median'], result['median']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark curve evaluation, hover queries and redraws.")
+    parser.add_argument('-o', '--output', default='benchmark.json', help="where to write the JSON results")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="allowed slowdown ratio against the baseline median")
+    parser.add_argument('--max-points', type=int, default=GRID_SIZES[-1])
+    parser.add_argument('--redraw-max-points', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    report = run(args.max_points, args.redraw_max_points, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report['results'].items():
+        print(f"{name:<40} {result['median'] * 1e6:12.1f} us")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1e6:.1f} us -> {after * 1e6:.1f} us")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
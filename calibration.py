@@ -0,0 +1,262 @@
+import itertools
+
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR
+
+MODELS = ('jump_rate', 'double_jump_rate', 'separated')
+
+KINK_COUNTS = {'jump_rate': 1, 'double_jump_rate': 2, 'separated': 1}
+DEFAULT_KINK_STEPS = {'jump_rate': 0.5, 'double_jump_rate': 2.0, 'separated': 0.5}
+
+# Candidate fits solved per batched SVD while searching kinks
+_CHUNK_FITS = 1 << 17
+
+UNDETERMINED = "Targets leave a slope undetermined; put at least one target in every segment"
+
+
+def _segment_features(utilization, kinks):
+    # Length of [0, U] spent in each segment: rate = base + features @ slopes
+    # for sorted kinks, identical to rate_engine.piecewise_rates
+    zero = np.zeros(kinks.shape[:-1] + (1,))
+    starts = np.concatenate((zero, kinks), axis=-1)[..., None, :]
+    ends = np.concatenate((kinks, np.full(zero.shape, np.inf)), axis=-1)[..., None, :]
+    return np.clip(utilization[..., None], starts, ends) - starts
+
+
+def _design(model, utilization, supply, kinks, reserve_factor, fit_base, fit_supply_base):
+    features = _segment_features(utilization, kinks)
+    ones = np.ones(features.shape[:-1] + (1,))
+    if model == 'separated':
+        borrow = np.concatenate((ones, features), axis=-1) if fit_base else features
+        supply_part = np.concatenate((ones, features), axis=-1) if fit_supply_base else features
+        mask = supply[..., None]
+        return np.concatenate((np.where(mask, 0.0, borrow), np.where(mask, supply_part, 0.0)), axis=-1)
+
+    design = np.concatenate((ones, features), axis=-1) if fit_base else features
+    # Supply = borrow * U / 100 * (1 - reserve factor), still linear in base and slopes
+    factor = np.where(supply, utilization / 100 * (1 - reserve_factor / 100.0), 1.0)
+    return design * factor[..., None]
+
+
+def _fixed_part(model, utilization, supply, reserve_factor, base_rate, supply_base_rate):
+    # Contribution of fixed base rates, in APR
+    fixed = np.zeros(utilization.shape)
+    if model == 'separated':
+        if base_rate is not None:
+            fixed = fixed + np.where(supply, 0.0, base_rate * SECONDS_PER_YEAR)
+        if supply_base_rate is not None:
+            fixed = fixed + np.where(supply, supply_base_rate * SECONDS_PER_YEAR, 0.0)
+        return fixed
+    if base_rate is not None:
+        factor = np.where(supply, utilization / 100 * (1 - reserve_factor / 100.0), 1.0)
+        fixed = fixed + base_rate * SECONDS_PER_YEAR * factor
+    return fixed
+
+
+def _groups(model, supply, fit_base, fit_supply_base):
+    # (columns, slope columns, target rows) fitted independently of each other
+    slopes = KINK_COUNTS[model] + 1
+    borrow = np.arange(int(fit_base) + slopes)
+    if model != 'separated':
+        return [(borrow, borrow[int(fit_base):], np.ones_like(supply), 'the rates')]
+    supply_columns = len(borrow) + np.arange(int(fit_supply_base) + slopes)
+    return [(borrow, borrow[int(fit_base):], ~supply, 'the borrow curve'),
+            (supply_columns, supply_columns[int(fit_supply_base):], supply, 'the supply curve')]
+
+
+def _lstsq(design, target):
+    # Minimum-norm least squares and column rank from one batched SVD, as pinv
+    u, s, vt = np.linalg.svd(design, full_matrices=False)
+    cutoff = 1e-15 * s[..., :1]
+    inverse = np.where(s > cutoff, 1 / np.where(s > cutoff, s, 1), 0.0)
+    projected = (np.swapaxes(u, -1, -2) @ target[..., None])[..., 0] * inverse
+    return (np.swapaxes(vt, -1, -2) @ projected[..., None])[..., 0], np.count_nonzero(s > cutoff, axis=-1)
+
+
+def _solve(design, target, groups, pin_negative=True):
+    """Least squares with non-negative slopes, per column group.
+
+    With `pin_negative` fits with a negative slope are redone for every
+    subset of their slopes pinned to zero and the cheapest fit with none
+    negative kept, which is the exact non-negative solution for the handful
+    of slopes a model has; without it they are only marked invalid.  Groups
+    without targets come back NaN; `valid` is also false where the targets
+    do not pin down every parameter of a group.
+    """
+    shape = design.shape[:-2]
+    coefficients = np.full(shape + design.shape[-1:], np.nan)
+    squares = np.zeros(shape)
+    valid = np.ones(shape, dtype=bool)
+    for columns, slopes, rows, _ in groups:
+        rows = np.broadcast_to(rows, design.shape[:-1])
+        part = np.where(rows[..., None], design[..., columns], 0.0)
+        goal = np.where(rows, target, 0.0)
+        constrained = np.isin(columns, slopes)
+        fit, rank = _lstsq(part, goal)
+
+        negative = np.any(fit[..., constrained] < 0, axis=-1)
+        if not pin_negative:
+            valid &= ~negative
+        elif negative.any():
+            negative = np.nonzero(negative)
+            part_n, goal_n = part[negative], goal[negative]
+            best, best_fit = np.full(len(part_n), np.inf), np.zeros((len(part_n), len(columns)))
+            for size in range(1, constrained.sum() + 1):
+                for pinned in itertools.combinations(np.flatnonzero(constrained), size):
+                    keep = np.ones(len(columns))
+                    keep[list(pinned)] = 0
+                    trial = _lstsq(part_n * keep, goal_n)[0] * keep
+                    cost = np.sum(((part_n @ trial[..., None])[..., 0] - goal_n) ** 2, axis=-1)
+                    better = np.all(trial[:, constrained] >= 0, axis=-1) & (cost < best)
+                    best = np.where(better, cost, best)
+                    best_fit = np.where(better[:, None], trial, best_fit)
+            fit[negative] = best_fit
+
+        present = rows.any(axis=-1)
+        valid &= ~present | (rank == len(columns))
+        coefficients[..., columns] = np.where(present[..., None], fit, np.nan)
+        squares += np.sum(((part @ fit[..., None])[..., 0] - goal) ** 2, axis=-1)
+    return coefficients, np.sqrt(squares / target.shape[-1]), valid
+
+
+def _check_counts(groups, searched_kinks):
+    # Fewer targets than unknowns leaves a family of exact fits to pick from arbitrarily
+    total = needed = 0
+    for columns, _, rows, name in groups:
+        count = np.sum(rows, axis=-1)
+        short = (count > 0) & (count < len(columns))
+        if np.any(short):
+            raise ValueError(f"Fitting {name} needs at least {len(columns)} targets, got {np.min(count[short])}")
+        total = total + count
+        needed = needed + np.where(count > 0, len(columns), 0)
+    short = total < needed + searched_kinks
+    if searched_kinks and np.any(short):
+        raise ValueError(f"Searching {searched_kinks} kink(s) needs at least {np.min(needed[short]) + searched_kinks} "
+                         f"targets, got {np.min(total[short])}; add targets or fix the kinks")
+
+
+def _kink_candidates(model, kink_step):
+    grid = np.arange(kink_step, 100, kink_step)
+    if KINK_COUNTS[model] == 1:
+        return grid[:, None]
+    return np.array(list(itertools.combinations(grid, 2)))
+
+
+def parse_targets(text):
+    """`"80:4, 100:60"` -> ([80.0, 100.0], [4.0, 60.0]) utilization and APR lists."""
+    utilization, apr = [], []
+    for item in text.replace(';', ',').split(','):
+        if not item.strip():
+            continue
+        u, a = item.split(':')
+        utilization.append(float(u.strip().rstrip('%')))
+        apr.append(float(a.strip().rstrip('%')))
+    return utilization, apr
+
+
+def calibrate(model, utilization, apr, side='borrow', kinks=None, base_rate=None,
+              supply_base_rate=None, reserve_factor=0.0, kink_step=None):
+    """Fit model parameters to target (utilization, APR) points for many markets at once.
+
+    `utilization` and `apr` (both in percent) are `(markets, targets)` arrays
+    or 1-D for a single market; `side` says per target (or for all) whether
+    it constrains the `'borrow'` or `'supply'` APR.  Given the kinks the rates
+    are linear in the base rate and slopes, so those are solved in closed form
+    by least squares, with slopes kept non-negative.  With `kinks=None`
+    every kink on a `kink_step` grid is tried and the one with the smallest
+    error kept.  `base_rate` and `supply_base_rate` fix the base rates per
+    second instead of fitting them; `reserve_factor` (percent) is always
+    given.
+
+    Raises `ValueError` when there are fewer targets than unknowns (searched
+    kinks included).  Markets whose targets still leave a slope undetermined,
+    such as no target beyond a kink, get NaN parameters and error; so does a
+    separated curve without targets of its own.
+
+    Returns a dict with the keyword arguments of the matching `RateModel`
+    constructor plus `rms_error` (APR percentage points).
+    """
+    if model not in MODELS:
+        raise ValueError(f"model must be one of {MODELS}")
+    single = np.ndim(utilization) == 1
+    utilization = np.atleast_2d(np.asarray(utilization, dtype=float))
+    apr = np.broadcast_to(np.atleast_2d(np.asarray(apr, dtype=float)), utilization.shape)
+    supply = np.broadcast_to(np.asarray(side) == 'supply', utilization.shape)
+    markets = len(utilization)
+    reserve_factor = np.broadcast_to(np.asarray(reserve_factor, dtype=float), (markets,))[:, None]
+
+    fit_base = base_rate is None
+    fit_supply_base = model == 'separated' and supply_base_rate is None
+    fixed_base = None if fit_base else np.broadcast_to(np.asarray(base_rate, dtype=float), (markets,))[:, None]
+    fixed_supply_base = None
+    if model == 'separated' and not fit_supply_base:
+        fixed_supply_base = np.broadcast_to(np.asarray(supply_base_rate, dtype=float), (markets,))[:, None]
+    target = apr - _fixed_part(model, utilization, supply, reserve_factor, fixed_base, fixed_supply_base)
+    groups = _groups(model, supply, fit_base, fit_supply_base)
+    _check_counts(groups, KINK_COUNTS[model] if kinks is None else 0)
+
+    if kinks is not None:
+        kinks = np.asarray(kinks, dtype=float).reshape(-1, KINK_COUNTS[model])
+        kinks = np.broadcast_to(kinks, (markets, KINK_COUNTS[model]))
+        design = _design(model, utilization, supply, kinks, reserve_factor, fit_base, fit_supply_base)
+        coefficients, error, valid = _solve(design, target, groups)
+    else:
+        candidates = _kink_candidates(model, kink_step or DEFAULT_KINK_STEPS[model])
+        kinks = np.empty((markets, candidates.shape[1]))
+        coefficients = error = None
+        per_chunk = max(1, _CHUNK_FITS // len(candidates))
+        for start in range(0, markets, per_chunk):
+            part = slice(start, start + per_chunk)
+            design = _design(model, utilization[part, None], supply[part, None], candidates[None],
+                             reserve_factor[part, None], fit_base, fit_supply_base)
+            chunk_groups = [(columns, slopes, rows[part, None], name) for columns, slopes, rows, name in groups]
+            # Only kinks with every parameter pinned down and no negative slope compete;
+            # markets left without one fall back to pinning slopes at zero
+            fits, errors, fitted = _solve(design, target[part, None], chunk_groups, pin_negative=False)
+            retry = ~fitted.any(axis=1)
+            if retry.any():
+                retry_groups = [(columns, slopes, rows[retry], name) for columns, slopes, rows, name in chunk_groups]
+                fits[retry], errors[retry], fitted[retry] = _solve(design[retry], target[part, None][retry],
+                                                                   retry_groups)
+            best = np.argmin(np.where(fitted, errors, np.inf), axis=1)
+            rows = np.arange(len(best))
+            if coefficients is None:
+                coefficients = np.empty((markets, fits.shape[-1]))
+                error = np.empty(markets)
+                valid = np.empty(markets, dtype=bool)
+            coefficients[part], error[part], kinks[part] = fits[rows, best], errors[rows, best], candidates[best]
+            valid[part] = fitted[rows, best]
+        kinks[~valid] = np.nan
+
+    coefficients = np.where(valid[:, None], coefficients, np.nan)
+    error = np.where(valid, error, np.nan)
+    rates = coefficients / SECONDS_PER_YEAR
+    return _parameters(model, rates, kinks, fit_base, base_rate, fit_supply_base, supply_base_rate,
+                       reserve_factor[:, 0], error, markets, single)
+
+
+def _parameters(model, rates, kinks, fit_base, base_rate, fit_supply_base, supply_base_rate,
+                reserve_factor, error, markets, single):
+    columns = iter(rates.T)
+
+    def base(fit, fixed):
+        return next(columns) if fit else np.broadcast_to(np.asarray(fixed, dtype=float), (markets,))
+
+    if model == 'separated':
+        params = {'base_borrow_rate': base(fit_base, base_rate)}
+        params['low_slope_borrow'], params['high_slope_borrow'] = next(columns), next(columns)
+        params['base_supply_rate'] = base(fit_supply_base, supply_base_rate)
+        params['low_slope_supply'], params['high_slope_supply'] = next(columns), next(columns)
+        params['u_optimal'] = kinks[:, 0]
+    elif model == 'jump_rate':
+        params = {'base_rate': base(fit_base, base_rate), 'low_slope': next(columns),
+                  'high_slope': next(columns), 'u_optimal': kinks[:, 0], 'reserve_factor': reserve_factor}
+    else:
+        params = {'base_rate': base(fit_base, base_rate), 'low_slope': next(columns),
+                  'first_jump_slope': next(columns), 'second_jump_slope': next(columns),
+                  'first_kink': kinks[:, 0], 'second_kink': kinks[:, 1], 'reserve_factor': reserve_factor}
+    params['rms_error'] = error
+    if single:
+        return {name: float(value[0]) for name, value in params.items()}
+    return {name: np.ascontiguousarray(value) for name, value in params.items()}
@@ -0,0 +1,57 @@
+import argparse
+import subprocess
+import sys
+
+# NumPy-only modules that pricing workers import
+CORE_MODULES = ('rate_engine', 'rate_sweep', 'accrual', 'fixed_point', 'calibration', 'solvency')
+
+# Front-end dependencies the core must never pull in
+HEAVY_MODULES = ('tkinter', 'matplotlib', 'mplcursors', 'streamlit', 'plotly', 'pandas', 'pyarrow')
+
+DEFAULT_BUDGET_MS = 15.0
+
+
+def measure(module, repeat=5):
+    """Best-of-`repeat` cumulative import time of `module` in ms, with NumPy already loaded.
+
+    Each run uses a fresh interpreter and `-X importtime`, so caches from
+    earlier imports in this process do not hide anything.  Also returns the
+    heavy modules found in `sys.modules` afterwards.
+    """
+    code = (f"import numpy, sys; import {module}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                capture_output=True, text=True, check=True)
+        for line in result.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].rstrip() == f" {module}":
+                cumulative = int(fields[1]) / 1000
+                best = cumulative if best is None else min(best, cumulative)
+        heavy = [name for name in result.stdout.strip().split(',') if name]
+    return best, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the core modules.")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MS, help="per-module budget in ms")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('modules', nargs='*', default=CORE_MODULES)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        elapsed, heavy = measure(module, args.repeat)
+        status = 'ok'
+        if elapsed > args.budget:
+            status = f"over budget ({args.budget:.1f} ms)"
+        if heavy:
+            status = f"imports {', '.join(heavy)}"
+        failed |= status != 'ok'
+        print(f"{module:<14} {elapsed:7.2f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
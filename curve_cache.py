@@ -0,0 +1,208 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from rate_engine import _segments, supply_from_borrow
+from sampling import sample_curves
+
+DEFAULT_STORE = os.path.join(os.path.expanduser('~'), '.cache', 'irm-visualizer', 'curves')
+DEFAULT_STORE_BYTES = 256 << 20
+SLIDER_STEP = 0.01
+
+
+def _quantize(value, digits=10):
+    # Rates and slopes differ in magnitude, so round to significant digits
+    return float(f"{value:.{digits}g}")
+
+
+def model_key(model, skip=None):
+    """Hashable, quantized parameters of a `RateModel`; kink `skip` is left out.
+
+    Rates and slopes are rounded to ten significant digits.  Kinks are kept
+    exact, so two models share a key only if they draw the same corners.
+    """
+    def curve_key(curve):
+        kinks = tuple(None if i == skip else float(kink) for i, kink in enumerate(curve.kinks))
+        return (_quantize(curve.base_rate), kinks, tuple(_quantize(slope) for slope in curve.slopes))
+
+    supply = None if model.supply is None else curve_key(model.supply)
+    min_rate = None if model.min_rate is None else _quantize(model.min_rate)
+    return (curve_key(model.borrow), _quantize(model.reserve_factor), supply, min_rate)
+
+
+def _rates_at(points, segments):
+    # Piecewise-linear rates where every parameter row has its own points
+    starts, offsets, slopes, bounds = segments
+    starts = np.broadcast_to(starts, offsets.shape)
+    slopes = np.broadcast_to(slopes, offsets.shape)
+    index = np.count_nonzero(points[..., None] > bounds[:, None, :], axis=-1)
+    take = lambda values: np.take_along_axis(values, index, axis=-1)
+    return take(offsets) + (points - take(starts)) * take(slopes)
+
+
+def slider_table(model, index, points=100, step=SLIDER_STEP):
+    """Curves for every position of the slider driving kink `index`, as one array.
+
+    Kink `index` of the borrow curve (and of the supply curve, which the
+    separated model moves along with it) takes every value from 0 to 100 in
+    `step`s.  Row `i` of the `(positions, 3, points + kinks)` result holds
+    the utilization, borrow and supply arrays for position `i * step`: an
+    even grid of `points` with the row's kinks inserted, so every corner is
+    drawn exactly and a slider drag is one row lookup.
+    """
+    values = np.linspace(0, 100, int(round(100 / step)) + 1)
+
+    def swept(curve):
+        kinks = np.tile(np.asarray(curve.kinks, dtype=float), (len(values), 1))
+        kinks[:, index] = values
+        return kinks, _segments(curve.base_rate, kinks, curve.slopes)
+
+    kinks, borrow_segments = swept(model.borrow)
+    utilization = np.sort(np.concatenate((np.broadcast_to(np.linspace(0, 100, points), (len(values), points)),
+                                          np.clip(kinks, 0, 100)), axis=1), axis=1)
+    table = np.empty((len(values), 3, utilization.shape[1]))
+    table[:, 0] = utilization
+    table[:, 1] = _rates_at(utilization, borrow_segments)
+    if model.min_rate is not None:
+        np.maximum(table[:, 1], model.min_rate, out=table[:, 1])
+    if model.supply is not None:
+        table[:, 2] = _rates_at(utilization, swept(model.supply)[1])
+    else:
+        table[:, 2] = supply_from_borrow(utilization, table[:, 1], model.reserve_factor)
+    return table
+
+
+class CurveStore:
+    """Directory of `.npy` arrays shared by every process that points at it.
+
+    Arrays are written to a temporary file and renamed into place, so
+    readers never see a partial file, and are opened memory-mapped.  Reads
+    refresh a file's modification time; once the directory outgrows
+    `max_bytes` the least recently used files are deleted.
+    """
+
+    def __init__(self, path=DEFAULT_STORE, max_bytes=DEFAULT_STORE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(repr(key).encode()).hexdigest() + '.npy')
+
+    def load(self, key):
+        path = self._file(key)
+        try:
+            array = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return array
+
+    def save(self, key, array):
+        fd, temp = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        path = self._file(key)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+            os.replace(temp, path)
+        except BaseException:
+            # `evict` only sees `.npy` files, so a stray temporary would never be reclaimed
+            try:
+                os.remove(temp)
+            except FileNotFoundError:
+                pass
+            raise
+        self.evict()
+        return np.load(path, mmap_mode='r')
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.npy'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def default_store(path=DEFAULT_STORE, max_bytes=DEFAULT_STORE_BYTES):
+    """The shared on-disk store, or None when its directory cannot be created."""
+    try:
+        return CurveStore(path, max_bytes)
+    except OSError:
+        return None
+
+
+class CurveCache:
+    """Bounded LRU of plotted curves and slider tables, keyed on `model_key`.
+
+    `curves` memoizes `sample_curves` for the last `max_entries` parameter
+    sets.  `slider_curves` answers a slider position from a `slider_table`
+    built once per combination of the other parameters and kept for the
+    last `max_tables` combinations; with a `store` the tables also persist
+    on disk, so other sessions and processes start warm.
+    """
+
+    def __init__(self, max_entries=256, max_tables=4, store=None, step=SLIDER_STEP):
+        self.max_entries = max_entries
+        self.max_tables = max_tables
+        self.store = store
+        self.step = step
+        self._curves = OrderedDict()
+        self._tables = OrderedDict()
+
+    @staticmethod
+    def _lookup(entries, key):
+        value = entries.get(key)
+        if value is not None:
+            entries.move_to_end(key)
+        return value
+
+    @staticmethod
+    def _insert(entries, key, value, limit):
+        entries[key] = value
+        while len(entries) > limit:
+            entries.popitem(last=False)
+
+    def curves(self, model, mode='exact', points=100, max_points=None):
+        # Exact kinks, so a cached curve never draws a kink the hover quote does not have
+        key = (model_key(model), mode, points, max_points)
+        value = self._lookup(self._curves, key)
+        if value is None:
+            value = sample_curves(model, mode, points, max_points)
+            self._insert(self._curves, key, value, self.max_entries)
+        return value
+
+    def table(self, model, index, points=100):
+        # Only the dragged kink snaps to `step`; the others stay exact, so a table never moves a kink the user did not drag
+        key = ('slider', model_key(model, skip=index), index, points, self.step)
+        table = self._lookup(self._tables, key)
+        if table is None and self.store is not None:
+            table = self.store.load(key)
+        if table is None:
+            table = slider_table(model, index, points, self.step)
+            if self.store is not None:
+                try:
+                    table = self.store.save(key, table)
+                except OSError:
+                    pass
+        if key not in self._tables:
+            self._insert(self._tables, key, table, self.max_tables)
+        return table
+
+    def slider_curves(self, model, index, points=100):
+        """Utilization, borrow and supply arrays with kink `index` snapped to the table step."""
+        table = self.table(model, index, points)
+        row = int(np.clip(round(model.borrow.kinks[index] / self.step), 0, len(table) - 1))
+        utilization, borrow_rates, supply_rates = table[row]
+        return utilization, borrow_rates, supply_rates
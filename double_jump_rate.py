@@ -2,8 +2,10 @@ import tkinter as tk
 from tkinter import ttk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-import mplcursors
+from curve_cache import CurveCache, default_store
+from rate_engine import RateModel
+from tk_calibrate import CalibrationDialog
+from tk_plot import CurvePlot
 
 class InterestRateApp:
     def __init__(self, root):
@@ -14,13 +16,27 @@ class InterestRateApp:
         self.create_input_fields()
         self.create_kink_sliders()
 
-        self.plot_button = ttk.Button(self.root, text="Plot", command=self.update_plot)
-        self.plot_button.grid(row=7, column=0, columnspan=2, pady=10)
+        button_frame = ttk.Frame(self.root)
+        button_frame.grid(row=7, column=0, columnspan=2, pady=10)
+        self.plot_button = ttk.Button(button_frame, text="Plot", command=self.update_plot)
+        self.plot_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Calibrate...", command=self.open_calibration).pack(side=tk.LEFT, padx=5)
 
         self.figure, self.ax = plt.subplots(figsize=(5, 3))
         self.canvas = FigureCanvasTkAgg(self.figure, master=self.root)
         self.canvas.get_tk_widget().grid(row=8, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
 
+        # 'exact' samples the kinks themselves; 'grid' uses curve_points, thinned to max_plot_points
+        self.sampling = 'exact'
+        self.curve_points = 100
+        self.max_plot_points = 2000
+        # Slider drags read rows of a table precomputed over the whole slider range
+        self.precompute_sliders = True
+        self.curves = CurveCache(store=default_store())
+        self.plot = CurvePlot(self.root, self.ax, self.canvas, self.on_hover)
+        self.plot.create_status_bar(row=9)
+
+        self.model = None
         self.data_borrow = None
         self.data_supply = None
 
@@ -56,7 +72,7 @@ class InterestRateApp:
         first_kink_frame.grid(row=5, column=1, padx=10, pady=5, sticky="ew")
 
         self.first_kink = tk.DoubleVar(value=5.0)
-        self.first_kink_slider = ttk.Scale(first_kink_frame, from_=0, to=100, orient=tk.HORIZONTAL, variable=self.first_kink, command=self.update_slider_label)
+        self.first_kink_slider = ttk.Scale(first_kink_frame, from_=0, to=100, orient=tk.HORIZONTAL, variable=self.first_kink, command=lambda value: self.update_slider_label(value, 0))
         self.first_kink_slider.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
         self.first_kink_label = ttk.Label(first_kink_frame, text=f"{self.first_kink.get():.2f}%")
@@ -69,68 +85,52 @@ class InterestRateApp:
         second_kink_frame.grid(row=6, column=1, padx=10, pady=5, sticky="ew")
 
         self.second_kink = tk.DoubleVar(value=85.0)
-        self.second_kink_slider = ttk.Scale(second_kink_frame, from_=0, to=100, orient=tk.HORIZONTAL, variable=self.second_kink, command=self.update_slider_label)
+        self.second_kink_slider = ttk.Scale(second_kink_frame, from_=0, to=100, orient=tk.HORIZONTAL, variable=self.second_kink, command=lambda value: self.update_slider_label(value, 1))
         self.second_kink_slider.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
         self.second_kink_label = ttk.Label(second_kink_frame, text=f"{self.second_kink.get():.2f}%")
         self.second_kink_label.pack(side=tk.RIGHT, padx=(10, 0))
 
-    def update_slider_label(self, value):
+    def update_slider_label(self, value, slider=None):
         self.first_kink_label.config(text=f"{self.first_kink.get():.2f}%")
         self.second_kink_label.config(text=f"{self.second_kink.get():.2f}%")
-        self.update_plot()
-
-    def update_plot(self, *args):
-        base_rate = self.base_borrow_rate.get()
-        low_slope = self.low_slope.get()
-        first_jump_slope = self.first_jump_slope.get()
-        second_jump_slope = self.second_jump_slope.get()
-        first_kink = self.first_kink.get()
-        second_kink = self.second_kink.get()
-        reserve_factor = self.reserve_factor.get() / 100.0
-
-        utilization = np.linspace(0, 100, 100)
-        borrow_rates = []
-        supply_rates = []
-
-        for U in utilization:
-            if U <= first_kink:
-                borrow_rate = base_rate + (U * low_slope)
-            elif U <= second_kink:
-                normal_rate = base_rate + (first_kink * low_slope)
-                excess_util = U - first_kink
-                borrow_rate = normal_rate + (excess_util * first_jump_slope)
-            else:
-                normal_rate = base_rate + (first_kink * low_slope)
-                normal_rate += (second_kink - first_kink) * first_jump_slope
-                excess_util = U - second_kink
-                borrow_rate = normal_rate + (excess_util * second_jump_slope)
-
-            supply_rate = borrow_rate * (U / 100) * (1 - reserve_factor)
-            borrow_rates.append(borrow_rate)
-            supply_rates.append(supply_rate)
-
-        self.ax.clear()
-        self.data_borrow, = self.ax.plot(utilization, borrow_rates, '-b', label='Borrow Rate')
-        self.data_supply, = self.ax.plot(utilization, supply_rates, '-r', label='Supply Rate')
-        self.ax.set_title('Borrow and Supply Rates')
-        self.ax.set_xlabel('Utilization (%)')
-        self.ax.set_ylabel('Rate (per unit of time)')
-        self.ax.legend()
-
-        # Add mplcursors to enable hover
-        self.cursor = mplcursors.cursor(self.ax)
-        self.cursor.connect("add", self.on_hover)
-
-        self.canvas.draw()
+        self.plot.schedule(lambda: self.update_plot(slider=slider))
+
+    def open_calibration(self):
+        fields = {'base_rate': self.base_borrow_rate, 'low_slope': self.low_slope,
+                  'first_jump_slope': self.first_jump_slope, 'second_jump_slope': self.second_jump_slope,
+                  'first_kink': self.first_kink, 'second_kink': self.second_kink,
+                  'reserve_factor': self.reserve_factor}
+        CalibrationDialog(self.root, 'double_jump_rate', fields, ('first_kink', 'second_kink'),
+                          lambda: self.update_slider_label(None))
+
+    def update_plot(self, *args, slider=None):
+        timer = self.plot.timer
+        with timer.phase('update_plot'):
+            with timer.phase('read_vars'):
+                base_rate = self.base_borrow_rate.get()
+                low_slope = self.low_slope.get()
+                first_jump_slope = self.first_jump_slope.get()
+                second_jump_slope = self.second_jump_slope.get()
+                first_kink = self.first_kink.get()
+                second_kink = self.second_kink.get()
+                reserve_factor = self.reserve_factor.get()
+
+            with timer.phase('model'):
+                self.model = RateModel.double_jump_rate(base_rate, low_slope, first_jump_slope, second_jump_slope,
+                                                        first_kink, second_kink, reserve_factor)
+            with timer.phase('sample'):
+                if slider is not None and self.precompute_sliders:
+                    curves = self.curves.slider_curves(self.model, slider, self.curve_points)
+                else:
+                    curves = self.curves.curves(self.model, self.sampling, self.curve_points, self.max_plot_points)
+                utilization, borrow_rates, supply_rates = curves
+            self.data_borrow, self.data_supply = self.plot.draw(utilization, borrow_rates, supply_rates)
 
     def on_hover(self, sel):
         x = sel.target[0]
-        borrow_rate_y = np.interp(x, np.linspace(0, 100, len(self.data_borrow.get_ydata())), self.data_borrow.get_ydata())
-        supply_rate_y = np.interp(x, np.linspace(0, 100, len(self.data_supply.get_ydata())), self.data_supply.get_ydata())
-        borrow_apr = borrow_rate_y * 31536000
-        supply_apr = supply_rate_y * 31536000
-        sel.annotation.set_text(f'Utilization: {x:.2f}%\nBorrow Rate: {borrow_rate_y:.2e} ({borrow_apr:.2f}%)\nSupply Rate: {supply_rate_y:.2e} ({supply_apr:.2f}%)')
+        quote = self.model.quote(x)
+        sel.annotation.set_text(f'Utilization: {x:.2f}%\nBorrow Rate: {quote.borrow_rate:.2e} ({quote.borrow_apr:.2f}%)\nSupply Rate: {quote.supply_rate:.2e} ({quote.supply_apr:.2f}%)')
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,89 +1,247 @@
+import json
+import time
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
+from calibration import UNDETERMINED, calibrate, parse_targets
+from rate_engine import config_format, parse_configs
+from rate_sweep import double_jump_rate_sweep, jump_rate_sweep
+from sampling import jump_rate_curves
+from market_overlay import MarketOverlay
+from timing import PhaseTimer
+
+rerun_started = time.perf_counter()
+# One timer per session, so rolling percentiles span reruns
+timer = st.session_state.setdefault('phase_timer', PhaseTimer())
+timer.enabled = st.sidebar.checkbox('Profile Phases', value=False)
 
 st.title('2-Slope and 3-Slope Jump Rate Interest Models')
 
 model_type = st.radio("Select Interest Rate Model", ('2-Slope', '3-Slope'))
 
-base_rate = st.number_input('Base Borrow Rate', format="%.10e", value=0.0)
-reserve_factor = st.number_input('Reserve Factor (%)', value=10.0)
+# Defaults live in session state so the calibration below can overwrite them
+for key, default in (('base_rate', 0.0), ('reserve_factor', 10.0), ('low_slope_3', 0.0),
+                     ('first_jump_slope', 1.93782062e-9), ('second_jump_slope', 1.9e-7), ('first_kink', 5),
+                     ('second_kink', 95), ('low_slope_2', 1.93782062e-9), ('jump_slope', 1.9e-7), ('kink', 90)):
+    st.session_state.setdefault(key, default)
+
+base_rate = st.number_input('Base Borrow Rate', format="%.10e", key='base_rate')
+reserve_factor = st.number_input('Reserve Factor (%)', key='reserve_factor')
 
 if model_type == '3-Slope':
-    low_slope = st.number_input('Low Slope (3-Slope)', format="%.10e", value=0.0)
-    first_jump_slope = st.number_input('First Jump Slope (3-Slope)', format="%.10e", value=1.93782062e-9)
-    second_jump_slope = st.number_input('Second Jump Slope (3-Slope)', format="%.10e", value=1.9e-7)
-    first_kink = st.slider('First Kink (%) (3-Slope)', min_value=0, max_value=100, value=5)
-    second_kink = st.slider('Second Kink (%) (3-Slope)', min_value=0, max_value=100, value=95)
+    low_slope = st.number_input('Low Slope (3-Slope)', format="%.10e", key='low_slope_3')
+    first_jump_slope = st.number_input('First Jump Slope (3-Slope)', format="%.10e", key='first_jump_slope')
+    second_jump_slope = st.number_input('Second Jump Slope (3-Slope)', format="%.10e", key='second_jump_slope')
+    first_kink = st.slider('First Kink (%) (3-Slope)', min_value=0, max_value=100, key='first_kink')
+    second_kink = st.slider('Second Kink (%) (3-Slope)', min_value=0, max_value=100, key='second_kink')
 else:
-    low_slope = st.number_input('Low Slope (2-Slope)', format="%.10e", value=1.93782062e-9)
-    jump_slope = st.number_input('Jump Slope (2-Slope)', format="%.10e", value=1.9e-7)
-    kink = st.slider('Kink (%) (2-Slope)', min_value=0, max_value=100, value=90)
-
-def calculate_rates(base_rate, low_slope, reserve_factor, model_type, jump_slope=None, kinks=None):
-    utilization = np.linspace(0, 100, 100)
-    borrow_rates, supply_rates, borrow_aprs, supply_aprs = [], [], [], []
-
-    for U in utilization:
-        if model_type == '3-Slope':
-            first_kink, second_kink = kinks
-            if U <= first_kink:
-                borrow_rate = base_rate + (U * low_slope)
-            elif U <= second_kink:
-                borrow_rate = base_rate + (first_kink * low_slope) + (U - first_kink) * first_jump_slope
-            else:
-                borrow_rate = (base_rate + (first_kink * low_slope) + 
-                               (second_kink - first_kink) * first_jump_slope + 
-                               (U - second_kink) * second_jump_slope)
-        else:
-            borrow_rate = base_rate + (U * low_slope) if U <= kink else (base_rate + (kink * low_slope) + (U - kink) * jump_slope)
-
-        borrow_rate = max(0, borrow_rate)
-        supply_rate = borrow_rate * (U / 100) * (1 - reserve_factor / 100)
-
-        borrow_rates.append(borrow_rate)
-        supply_rates.append(supply_rate)
-        borrow_aprs.append(borrow_rate * 31536000)
-        supply_aprs.append(supply_rate * 31536000)
-
-    return utilization, borrow_rates, supply_rates, borrow_aprs, supply_aprs
-
-if st.button('Plot'):
+    low_slope = st.number_input('Low Slope (2-Slope)', format="%.10e", key='low_slope_2')
+    jump_slope = st.number_input('Jump Slope (2-Slope)', format="%.10e", key='jump_slope')
+    kink = st.slider('Kink (%) (2-Slope)', min_value=0, max_value=100, key='kink')
+
+def apply_calibration(model_type, borrow_text, supply_text, fit_base, fit_kinks):
+    # Runs as a button callback, before the widgets above are created again
+    state = st.session_state
+    try:
+        borrow_u, borrow_apr = parse_targets(borrow_text)
+        supply_u, supply_apr = parse_targets(supply_text)
+    except ValueError:
+        state['calibration_message'] = "Targets must look like 80:4, 100:60"
+        return
+    if not borrow_u and not supply_u:
+        return
+
+    three_slope = model_type == '3-Slope'
+    kink_keys = ('first_kink', 'second_kink') if three_slope else ('kink',)
+    # Kink sliders are whole percents, so searched kinks are too
+    try:
+        params = calibrate('double_jump_rate' if three_slope else 'jump_rate', borrow_u + supply_u,
+                           borrow_apr + supply_apr, side=['borrow'] * len(borrow_u) + ['supply'] * len(supply_u),
+                           kinks=None if fit_kinks else [state[key] for key in kink_keys], kink_step=1,
+                           base_rate=None if fit_base else state['base_rate'], reserve_factor=state['reserve_factor'])
+    except ValueError as error:
+        state['calibration_message'] = str(error)
+        return
+    if np.isnan(params['rms_error']):
+        state['calibration_message'] = UNDETERMINED
+        return
+
+    state['base_rate'] = params['base_rate']
+    if three_slope:
+        state['low_slope_3'] = params['low_slope']
+        state['first_jump_slope'] = params['first_jump_slope']
+        state['second_jump_slope'] = params['second_jump_slope']
+        state['first_kink'], state['second_kink'] = int(params['first_kink']), int(params['second_kink'])
+    else:
+        state['low_slope_2'] = params['low_slope']
+        state['jump_slope'] = params['high_slope']
+        state['kink'] = int(params['u_optimal'])
+    state['calibration_message'] = f"Calibrated, RMS error {params['rms_error']:.4f} APR points"
+
+with st.expander('Calibrate to Target APRs'):
+    borrow_targets = st.text_input('Borrow Targets (U%:APR%, ...)', value='80:4, 100:60')
+    supply_targets = st.text_input('Supply Targets (U%:APR%, ...)', value='')
+    fit_base = st.checkbox('Fit Base Rate', value=False)
+    fit_kinks = st.checkbox('Fit Kinks', value=False)
+    st.button('Calibrate', on_click=apply_calibration,
+              args=(model_type, borrow_targets, supply_targets, fit_base, fit_kinks))
+    if 'calibration_message' in st.session_state:
+        st.caption(st.session_state['calibration_message'])
+
+# Cached per parameter tuple, shared by every session on this server
+@st.cache_data(max_entries=256)
+def calculate_rates(base_rate, low_slope, reserve_factor, jump_slopes, kinks, sampling='exact', points=100):
+    return jump_rate_curves(base_rate, low_slope, reserve_factor, jump_slopes, kinks, sampling, points)
+
+# Grid by default: hover snaps to the plotted points, and Exact draws only a handful
+sampling = st.radio('Sampling', ('Exact', 'Grid'), index=1, horizontal=True,
+                    help="Exact samples the kinks themselves, so hover only reaches those few points; "
+                         "Grid evaluates evenly spaced points, downsampled with LTTB above 2000 points")
+points = st.number_input('Grid Points', min_value=2, max_value=10_000_000, value=100) if sampling == 'Grid' else 100
+live_update = st.checkbox('Live Update', value=False)
+plot_clicked = st.button('Plot', disabled=live_update)
+
+timer.record('widgets', rerun_started, time.perf_counter())
+
+if live_update or plot_clicked:
     if model_type == '3-Slope':
-        kinks = (first_kink, second_kink)
-        utilization, borrow_rates, supply_rates, borrow_aprs, supply_aprs = calculate_rates(
-            base_rate, low_slope, reserve_factor, model_type, 
-            jump_slope=None, kinks=kinks
-        )
+        jump_slopes, kinks = (first_jump_slope, second_jump_slope), (first_kink, second_kink)
     else:
+        jump_slopes, kinks = (jump_slope,), (kink,)
+    with timer.phase('calculate_rates'):
         utilization, borrow_rates, supply_rates, borrow_aprs, supply_aprs = calculate_rates(
-            base_rate, low_slope, reserve_factor, model_type, 
-            jump_slope=jump_slope, kinks=None
+            base_rate, low_slope, reserve_factor, jump_slopes, kinks, sampling.lower(), int(points)
         )
 
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=utilization, y=borrow_rates,
-        mode='lines+markers',
-        name='Borrow Rates',
-        hovertemplate="Borrow Rate: %{y:.2e}<br>Borrow APR: %{customdata:.2f}%",
-        customdata=borrow_aprs
-    ))
+    with timer.phase('build_figure'):
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=utilization, y=borrow_rates,
+            mode='lines+markers',
+            name='Borrow Rates',
+            hovertemplate="Borrow Rate: %{y:.2e}<br>Borrow APR: %{customdata:.2f}%",
+            customdata=borrow_aprs
+        ))
+
+        fig.add_trace(go.Scatter(
+            x=utilization, y=supply_rates,
+            mode='lines+markers',
+            name='Supply Rates',
+            hovertemplate="Supply Rate: %{y:.2e}<br>Supply APR: %{customdata:.2f}%",
+            customdata=supply_aprs
+        ))
+
+        fig.update_layout(
+            title="Borrow and Supply Rates with APR",
+            xaxis_title="Utilization (%)",
+            yaxis_title="Rate",
+            hovermode="x",
+            legend=dict(x=0, y=1)
+        )
+
+    # Plotly serialization happens here
+    with timer.phase('plotly_chart'):
+        st.plotly_chart(fig)
+
+st.header('Parameter Sweep')
 
-    fig.add_trace(go.Scatter(
-        x=utilization, y=supply_rates,
-        mode='lines+markers',
-        name='Supply Rates',
-        hovertemplate="Supply Rate: %{y:.2e}<br>Supply APR: %{customdata:.2f}%",
-        customdata=supply_aprs
+if model_type == '3-Slope':
+    sweep_parameter = st.selectbox('Swept Parameter', ('First Kink', 'Second Kink', 'Reserve Factor'))
+else:
+    sweep_parameter = st.selectbox('Swept Parameter', ('Kink', 'Reserve Factor'))
+sweep_range = st.slider('Sweep Range (%)', min_value=0.0, max_value=100.0, value=(0.0, 100.0))
+sweep_steps = st.number_input('Sweep Steps', min_value=2, max_value=2001, value=101)
+sweep_points = st.number_input('Utilization Points', min_value=2, max_value=10001, value=501)
+sweep_quantity = st.selectbox('Quantity', ('Supply APR', 'Borrow APR', 'Supply Rate', 'Borrow Rate'))
+
+@st.cache_data(max_entries=16)
+def calculate_sweep(model_type, utilization_points, quantity, params):
+    utilization = np.linspace(0, 100, utilization_points)
+    if model_type == '3-Slope':
+        return double_jump_rate_sweep(utilization, quantity=quantity, min_rate=0, **params)
+    return jump_rate_sweep(utilization, quantity=quantity, min_rate=0, **params)
+
+if st.button('Sweep'):
+    sweep_values = np.linspace(sweep_range[0], sweep_range[1], int(sweep_steps))
+    utilization = np.linspace(0, 100, int(sweep_points))
+    quantity = sweep_quantity.lower().replace(' ', '_')
+
+    if model_type == '3-Slope':
+        params = dict(base_rate=base_rate, low_slope=low_slope, first_jump_slope=first_jump_slope,
+                      second_jump_slope=second_jump_slope, first_kink=first_kink, second_kink=second_kink,
+                      reserve_factor=reserve_factor)
+        params[sweep_parameter.lower().replace(' ', '_')] = sweep_values
+    else:
+        params = dict(base_rate=base_rate, low_slope=low_slope, high_slope=jump_slope,
+                      u_optimal=kink, reserve_factor=reserve_factor)
+        params['u_optimal' if sweep_parameter == 'Kink' else 'reserve_factor'] = sweep_values
+    with timer.phase('sweep'):
+        grid = calculate_sweep(model_type, int(sweep_points), quantity, params)
+
+    heatmap = go.Figure(go.Heatmap(
+        x=utilization, y=sweep_values, z=grid,
+        colorscale='Viridis',
+        colorbar=dict(title=sweep_quantity),
+        hovertemplate=f"Utilization: %{{x:.2f}}%<br>{sweep_parameter}: %{{y:.2f}}%<br>{sweep_quantity}: %{{z:.4g}}<extra></extra>"
     ))
+    heatmap.update_layout(
+        title=f"{sweep_quantity} over {sweep_parameter} and Utilization",
+        xaxis_title="Utilization (%)",
+        yaxis_title=f"{sweep_parameter} (%)"
+    )
+
+    with timer.phase('sweep_chart'):
+        st.plotly_chart(heatmap)
+
+
+st.header('Market Comparison')
+
+# One shared object per upload rather than a deep copy unpickled on every rerun;
+# filtering happens per session through `matches`, never on the shared overlay
+@st.cache_resource(max_entries=8)
+def load_overlay(data, file_name):
+    return MarketOverlay(parse_configs(data, config_format(file_name)))
 
-    fig.update_layout(
-        title="Borrow and Supply Rates with APR",
+market_file = st.file_uploader('Market Configs (JSON/YAML)', type=['json', 'yaml', 'yml'])
+
+if market_file is not None:
+    with timer.phase('load_overlay'):
+        overlay = load_overlay(market_file.getvalue(), market_file.name)
+    market_side = st.radio('Curve', ('Borrow APR', 'Supply APR'), horizontal=True)
+    market_filter = st.text_input('Filter Markets', value='')
+    visible = np.flatnonzero(overlay.matches(market_filter))
+
+    side = market_side.split()[0].lower()
+    # One WebGL trace per market from its few exact vertices, built in a single Figure call
+    comparison = go.Figure([
+        go.Scattergl(
+            x=overlay.sparse_curve(i, side)[0], y=overlay.sparse_curve(i, side)[1],
+            mode='lines',
+            name=overlay.names[i],
+            line=dict(width=1),
+            hovertemplate=f"{overlay.names[i]}<br>Utilization: %{{x:.2f}}%<br>{market_side}: %{{y:.2f}}%<extra></extra>"
+        )
+        for i in visible
+    ])
+    comparison.update_layout(
+        title=f"{market_side} ({len(visible)} of {len(overlay)} markets)",
         xaxis_title="Utilization (%)",
-        yaxis_title="Rate",
-        hovermode="x",
-        legend=dict(x=0, y=1)
+        yaxis_title="APR (%)",
+        hovermode="closest"
     )
 
-    st.plotly_chart(fig)
\ No newline at end of file
+    with timer.phase('overlay_chart'):
+        st.plotly_chart(comparison)
+
+timer.record('rerun', rerun_started, time.perf_counter())
+if timer.enabled:
+    stats = timer.stats()
+    st.sidebar.caption('Phase timings (ms): latest and over the last 200 reruns')
+    st.sidebar.table({
+        'phase': list(stats),
+        'latest': [f"{stat['latest'] * 1000:.1f}" for stat in stats.values()],
+        'p50': [f"{stat['p50'] * 1000:.1f}" for stat in stats.values()],
+        'p95': [f"{stat['p95'] * 1000:.1f}" for stat in stats.values()],
+    })
+    st.sidebar.download_button('Export Chrome Trace', json.dumps(timer.chrome_trace()),
+                               file_name='streamlit_trace.json', mime='application/json')
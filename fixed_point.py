@@ -0,0 +1,397 @@
+from decimal import Decimal
+
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR
+
+WAD = 10 ** 18
+RAY = 10 ** 27
+
+# Integers are held as 32-bit limbs in uint64 lanes along the leading axis
+# (least significant first), 8 limbs wide, so every value is a uint256 like
+# its on-chain counterpart, a limb product always fits a lane and each limb
+# is a contiguous row.
+_LIMB_BITS = 32
+_LIMB_MASK = np.uint64((1 << _LIMB_BITS) - 1)
+_LIMBS = 8
+_SMALL_DIVISOR_POWER = 13  # 5 ** 13 < 2 ** 32
+
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+
+def _int_to_limbs(value):
+    if value < 0 or value >> (_LIMB_BITS * _LIMBS):
+        raise OverflowError(f"{value} does not fit in uint256")
+    return np.array([(value >> (_LIMB_BITS * i)) & int(_LIMB_MASK) for i in range(_LIMBS)], dtype=np.uint64)
+
+
+def _ints_to_limbs(values):
+    # Object array of Python ints, split with exact integer shifts
+    values = np.asarray(values, dtype=object)
+    if values.size and (min(values.flat) < 0 or max(values.flat) >> (_LIMB_BITS * _LIMBS)):
+        raise OverflowError("values do not fit in uint256")
+    return np.stack([((values >> (_LIMB_BITS * i)) & int(_LIMB_MASK)).astype(np.uint64) for i in range(_LIMBS)])
+
+
+def _uint64_to_limbs(values):
+    limbs = np.zeros((_LIMBS,) + values.shape, dtype=np.uint64)
+    limbs[0] = values & _LIMB_MASK
+    limbs[1] = values >> np.uint64(_LIMB_BITS)
+    return limbs
+
+
+_SPLITTER = 2.0 ** 27 + 1
+
+
+def _split(a):
+    # Dekker split into halves whose products are exact
+    t = _SPLITTER * a
+    high = t - (t - a)
+    return high, a - high
+
+
+# Exact doubles, unlike a libm pow, with their Dekker halves
+_POWERS_OF_TEN = np.array([float(10 ** k) for k in range(23)])
+_POWER_HALVES = _split(_POWERS_OF_TEN)
+
+
+def _nearest_decimal(values, places):
+    # Nearest decimal with `places` places to each float, whether it lies inside
+    # the float's rounding interval and whether that is too close to call
+    value, value_high, value_low, half_ulp, below_power_of_two = values
+    power = _POWERS_OF_TEN[places]
+    power_high, power_low = _POWER_HALVES[0][places], _POWER_HALVES[1][places]
+    # value * power == high + low exactly (Dekker's product)
+    high = value * power
+    low = ((value_high * power_high - high) + value_high * power_low + value_low * power_high) + value_low * power_low
+    whole = np.rint(high)
+    fraction = (high - whole) + low
+    step = np.rint(fraction)
+    offset = step - fraction
+    # Just below a power of two the rounding interval is half as wide
+    reach = half_ulp * power
+    reach[below_power_of_two & (offset < 0)] *= 0.5
+    distance = np.abs(offset)
+    fits = high < 2.0 ** 63
+    inside = fits & (distance < reach * (1 - 1e-9))
+    undecided = (np.abs(distance - reach) <= reach * 1e-9) | (inside & (np.abs(distance - 0.5) < 1e-9))
+    digits = np.where(fits, whole, 0).astype(np.uint64) + step.astype(np.int64).astype(np.uint64)
+    return digits, inside, undecided
+
+
+def _shortest_decimals(values, max_places=17):
+    """`(digits, places)` with `digits / 10**places` the shortest repr of each float.
+
+    Like `repr`, takes the fewest decimal places with a decimal inside the
+    float's rounding interval, and the one nearest the float among those.
+    Having one is monotone in the places, so they are binary searched;
+    `value * 10**places` is formed exactly as a double-double, so only
+    distances within a hair of the interval edge or of a rounding tie are
+    undecided.  Those, and floats needing more places, get `places == -1`.
+    """
+    values = np.asarray(values, dtype=float)
+    digits = np.zeros(values.shape, dtype=np.uint64)
+    places = np.full(values.shape, -1)
+    index = np.flatnonzero(np.isfinite(values) & (values >= 0) & (values < 2.0 ** 53))
+    value = values[index]
+    mantissa, exponent = np.frexp(value)
+    prepared = (value,) + _split(value) + (np.ldexp(0.5, exponent - 53), mantissa == 0.5)
+
+    # Seventeen significant digits always round-trip, so no repr needs more places than that
+    with np.errstate(divide='ignore'):
+        most = np.clip(16 - np.floor(np.log10(value)), 0, max_places).astype(int)
+    _, usable, undecided = _nearest_decimal(prepared, most)
+    low, high = np.zeros(len(index), dtype=int), most
+    while np.any(active := usable & (low < high)):
+        middle = (low + high) // 2
+        _, inside, unsure = _nearest_decimal(prepared, middle)
+        undecided |= active & unsure
+        high = np.where(active & inside, middle, high)
+        low = np.where(active & ~inside, middle + 1, low)
+    found, _, unsure = _nearest_decimal(prepared, high)
+    usable &= ~(undecided | unsure)
+    digits[index[usable]] = found[usable]
+    places[index[usable]] = high[usable]
+    return digits, places
+
+
+def _used_limbs(a):
+    for i in reversed(range(len(a))):
+        if a[i].any():
+            return i + 1
+    return 0
+
+
+def _normalize(limbs):
+    for i in range(min(_used_limbs(limbs), len(limbs) - 1)):
+        limbs[i + 1] += limbs[i] >> np.uint64(_LIMB_BITS)
+        limbs[i] &= _LIMB_MASK
+    if np.any(limbs[_LIMBS:]) or np.any(limbs[_LIMBS - 1] >> np.uint64(_LIMB_BITS)):
+        raise OverflowError("uint256 overflow")
+    return limbs[:_LIMBS]
+
+
+def _add(a, b):
+    return _normalize(a + b)
+
+
+def _sub(a, b):
+    # Callers guarantee a >= b, as the contracts do before subtracting
+    out = a.astype(np.int64) - b.astype(np.int64)
+    for i in range(max(_used_limbs(a), 1) - 1):
+        borrow = out[i] < 0
+        out[i] += borrow * (1 << _LIMB_BITS)
+        out[i + 1] -= borrow
+    return out.astype(np.uint64)
+
+
+def _mul(a, b):
+    # Each output limb collects at most 2 * _LIMBS partial sums below 2**32,
+    # so carries can wait for a single normalization pass
+    out = np.zeros((2 * _LIMBS,) + np.broadcast_shapes(a.shape[1:], b.shape[1:]), dtype=np.uint64)
+    shift = np.uint64(_LIMB_BITS)
+    used_b = _used_limbs(b)
+    for i in range(_used_limbs(a)):
+        for j in range(used_b):
+            product = a[i] * b[j]
+            out[i + j] += product & _LIMB_MASK
+            out[i + j + 1] += product >> shift
+    return _normalize(out)
+
+
+def _div_small(a, divisor):
+    divisor = np.uint64(divisor)
+    out = np.zeros_like(a)
+    remainder = np.zeros(a.shape[1:], dtype=np.uint64)
+    for i in reversed(range(_used_limbs(a))):
+        current = (remainder << np.uint64(_LIMB_BITS)) | a[i]
+        out[i] = current // divisor
+        remainder = current % divisor
+    return out
+
+
+def _shift_right(a, bits):
+    out = a
+    while bits:
+        step = min(bits, _LIMB_BITS - 1)
+        low = out >> np.uint64(step)
+        low[:-1] |= (out[1:] << np.uint64(_LIMB_BITS - step)) & _LIMB_MASK
+        out, bits = low, bits - step
+    return out
+
+
+def _div_pow10(a, exponent):
+    # floor(floor(x / p) / q) == floor(x / (p * q)), so 10**e splits into
+    # a shift by e bits and a few short divisions by powers of five
+    out = _shift_right(a, exponent)
+    while exponent:
+        step = min(exponent, _SMALL_DIVISOR_POWER)
+        out = _div_small(out, 5 ** step)
+        exponent -= step
+    return out
+
+
+def _less(a, b):
+    less = np.zeros(np.broadcast_shapes(a.shape[1:], b.shape[1:]), dtype=bool)
+    decided = np.zeros_like(less)
+    for i in reversed(range(max(_used_limbs(a), _used_limbs(b)))):
+        less |= ~decided & (a[i] < b[i])
+        decided |= a[i] != b[i]
+    return less
+
+
+def _limbs_to_float(limbs):
+    return sum(limbs[i].astype(float) * 2.0 ** (_LIMB_BITS * i) for i in range(_LIMBS))
+
+
+def _limbs_to_ints(limbs):
+    if not np.any(limbs[2:]):
+        return limbs[0] | (limbs[1] << np.uint64(_LIMB_BITS))
+    out = np.zeros(limbs.shape[1:], dtype=object)
+    for i in reversed(range(_LIMBS)):
+        out = out * (1 << _LIMB_BITS) + limbs[i].astype(object)
+    return out
+
+
+def to_fixed(value, scale=WAD):
+    """Round a number to a fixed-point integer, reading floats as their shortest decimal repr."""
+    if isinstance(value, int):
+        return value * scale
+    if not isinstance(value, Decimal):
+        value = Decimal(repr(float(value)))
+    return int((value * scale).to_integral_value())
+
+
+def _exponent(scale):
+    exponent = len(str(scale)) - 1
+    if scale != 10 ** exponent:
+        raise ValueError("scale must be a power of ten")
+    return exponent
+
+
+class FixedPointModel:
+    """Integer re-implementation of the on-chain jump rate contracts.
+
+    All parameters are non-negative integers at `scale` (`WAD` or `RAY`):
+    utilization and kinks as fractions of one, rates and slopes per second
+    with slopes quoted at 100% utilization, and the reserve factor as a
+    fraction.  Every product is divided by `scale` with truncation, in the
+    same order as Compound's `JumpRateModel`:
+
+        rate   = offset_i + (u - kink_{i-1}) * slope_i / scale
+        offset = base + sum((kink_j - kink_{j-1}) * slope_j / scale)
+        supply = u * (rate * (scale - reserve_factor) / scale) / scale
+
+    With `supply=(base, kinks, slopes)` the supply rate follows its own curve
+    as in the separated model.
+    """
+
+    def __init__(self, base_rate, kinks, slopes, reserve_factor=0, supply=None, scale=WAD):
+        self.scale = scale
+        self._exponent = _exponent(scale)
+        self.reserve_factor = int(reserve_factor)
+        if not 0 <= self.reserve_factor <= scale:
+            raise ValueError("reserve factor must be between 0 and scale")
+        self.borrow = self._curve(base_rate, kinks, slopes)
+        self.supply = self._curve(*supply) if supply is not None else None
+
+    def _curve(self, base_rate, kinks, slopes):
+        base_rate, kinks, slopes = int(base_rate), [int(k) for k in kinks], [int(s) for s in slopes]
+        if len(slopes) != len(kinks) + 1:
+            raise ValueError("need exactly one more slope than kinks")
+        if min([base_rate] + kinks + slopes) < 0:
+            raise ValueError("fixed-point parameters must be non-negative")
+        if kinks != sorted(kinks):
+            raise ValueError("fixed-point kinks must be sorted")
+
+        starts = [0] + kinks
+        offsets = [base_rate]
+        for i in range(1, len(starts)):
+            offsets.append(offsets[-1] + (starts[i] - starts[i - 1]) * slopes[i - 1] // self.scale)
+        return (np.stack([_int_to_limbs(v) for v in starts], axis=-1),
+                np.stack([_int_to_limbs(v) for v in offsets], axis=-1),
+                np.stack([_int_to_limbs(v) for v in slopes], axis=-1),
+                [_int_to_limbs(v)[:, None] for v in kinks])
+
+    @classmethod
+    def from_model(cls, model, scale=WAD):
+        """Convert a float `RateModel` in the apps' units (percent, rate per percentage point)."""
+        def curve(rate_curve):
+            return (to_fixed(Decimal(repr(rate_curve.base_rate)) / 100, scale),
+                    [to_fixed(Decimal(repr(k)) / 100, scale) for k in rate_curve.kinks],
+                    [to_fixed(s, scale) for s in rate_curve.slopes])
+
+        supply = curve(model.supply) if model.supply is not None else None
+        reserve_factor = to_fixed(Decimal(repr(model.reserve_factor)) / 100, scale)
+        return cls(*curve(model.borrow), reserve_factor=reserve_factor, supply=supply, scale=scale)
+
+    def utilization_to_fixed(self, utilization):
+        """Round a utilization in percent to the nearest fixed-point fraction.
+
+        Floats are read as their shortest decimal repr, as in `to_fixed`, so
+        `80.0` is exactly `0.8 * scale` and lands on a kink rather than past
+        it.  Reprs come from `_shortest_decimals` and are scaled on the
+        limbs; the few it cannot settle go through `Decimal`.
+        """
+        utilization = np.asarray(utilization, dtype=float)
+        if np.any(utilization < 0):
+            raise ValueError("utilization must be non-negative")
+        values, inverse = np.unique(utilization, return_inverse=True)
+        digits, places = _shortest_decimals(values)
+        fast = places >= 0
+        # Percent to a fraction of one is a shift of `exponent - 2` decimal places
+        shift = self._exponent - 2 - places[fast]
+        divisor = np.array([10 ** i for i in range(19)], dtype=np.uint64)[np.maximum(-shift, 0)]
+        quotient, remainder = np.divmod(digits[fast], divisor)
+        # Rounding half to even, as `to_fixed` does
+        quotient += (2 * remainder > divisor) | ((2 * remainder == divisor) & (quotient % 2 == 1))
+        powers = _ints_to_limbs(np.array([10 ** i for i in range(max(self._exponent - 1, 1))], dtype=object))
+        limbs = np.zeros((_LIMBS, len(values)), dtype=np.uint64)
+        limbs[:, fast] = _mul(_uint64_to_limbs(quotient), powers[:, np.maximum(shift, 0)])
+        slow = np.flatnonzero(~fast)
+        if len(slow):
+            limbs[:, slow] = _ints_to_limbs(np.array(
+                [to_fixed(Decimal(repr(value)) / 100, self.scale) for value in values[slow].tolist()], dtype=object))
+        return limbs[:, inverse.reshape(utilization.shape)]
+
+    def _as_limbs(self, utilization):
+        utilization = np.asarray(utilization)
+        if utilization.dtype.kind in 'iu':
+            if np.any(utilization < 0):
+                raise ValueError("utilization must be non-negative")
+            return _uint64_to_limbs(utilization.astype(np.uint64))
+        if utilization.dtype.kind == 'O':
+            return _ints_to_limbs(utilization)
+        return self.utilization_to_fixed(utilization)
+
+    def _evaluate(self, utilization, curve):
+        starts, offsets, slopes, kinks = curve
+        index = np.zeros(utilization.shape[1:], dtype=np.intp)
+        for kink in kinks:
+            index += _less(kink, utilization)
+        excess = _sub(utilization, starts[:, index])
+        return _add(offsets[:, index], _div_pow10(_mul(excess, slopes[:, index]), self._exponent))
+
+    def _rates_limbs(self, utilization):
+        borrow = self._evaluate(utilization, self.borrow)
+        if self.supply is not None:
+            return borrow, self._evaluate(utilization, self.supply)
+        to_pool = _div_pow10(_mul(borrow, _int_to_limbs(self.scale - self.reserve_factor)[:, None]), self._exponent)
+        return borrow, _div_pow10(_mul(utilization, to_pool), self._exponent)
+
+    def rates(self, utilization, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Exact per-second borrow and supply rates as integers at `scale`.
+
+        Float `utilization` is read as percent and rounded to the nearest
+        fixed-point fraction; integer (or Python int object) arrays are taken
+        as already scaled.  Results are `uint64` arrays when they fit and
+        Python int object arrays otherwise.
+        """
+        limbs = self._as_limbs(utilization)
+        shape = limbs.shape[1:]
+        limbs = limbs.reshape(_LIMBS, -1)
+        borrow = np.empty_like(limbs)
+        supply = np.empty_like(limbs)
+        for start in range(0, limbs.shape[1], chunk_size):
+            part = slice(start, start + chunk_size)
+            borrow[:, part], supply[:, part] = self._rates_limbs(limbs[:, part])
+        return (_limbs_to_ints(borrow.reshape((_LIMBS,) + shape)),
+                _limbs_to_ints(supply.reshape((_LIMBS,) + shape)))
+
+    def to_float(self, rates):
+        """Convert fixed-point rates back to the apps' units (percent per second)."""
+        rates = np.asarray(rates)
+        if rates.dtype.kind == 'O':
+            limbs = np.stack([_int_to_limbs(int(v)) for v in rates.reshape(-1)], axis=-1)
+            rates = _limbs_to_float(limbs).reshape(rates.shape)
+        return rates.astype(float) / self.scale * 100
+
+
+def discrepancy_report(model, utilization, scale=WAD):
+    """Compare a float `RateModel` with its fixed-point counterpart across `utilization`.
+
+    Per-point errors are float minus fixed-point, in the apps' units (percent
+    per second).  `annual_index_error` is the difference after compounding
+    each rate every second for a year, which shows how the per-second error
+    adds up over accrual.
+    """
+    utilization = np.asarray(utilization, dtype=float)
+    fixed = FixedPointModel.from_model(model, scale)
+    float_borrow, float_supply = model.rates(utilization)
+    fixed_borrow, fixed_supply = (fixed.to_float(r) for r in fixed.rates(utilization))
+
+    report = {'utilization': utilization, 'scale': scale}
+    for side, float_rates, fixed_rates in (('borrow', float_borrow, fixed_borrow),
+                                           ('supply', float_supply, fixed_supply)):
+        error = float_rates - fixed_rates
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = np.where(fixed_rates != 0, error / fixed_rates, np.where(error == 0, 0.0, np.inf))
+        with np.errstate(over='ignore', invalid='ignore'):
+            index_error = (np.expm1(SECONDS_PER_YEAR * np.log1p(float_rates / 100))
+                           - np.expm1(SECONDS_PER_YEAR * np.log1p(fixed_rates / 100)))
+        report[f'{side}_error'] = error
+        report[f'{side}_max_abs_error'] = float(np.max(np.abs(error), initial=0.0))
+        report[f'{side}_max_rel_error'] = float(np.max(np.abs(relative), initial=0.0))
+        report[f'{side}_max_apr_error'] = report[f'{side}_max_abs_error'] * SECONDS_PER_YEAR
+        report[f'{side}_annual_index_error'] = float(np.max(np.abs(index_error), initial=0.0))
+    return report
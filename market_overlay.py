@@ -0,0 +1,100 @@
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR, RateModel
+from sampling import breakpoints, exact_samples
+
+SIDES = ('borrow', 'supply')
+
+
+class MarketOverlay:
+    """Borrow and supply APR curves of many markets on one shared utilization grid.
+
+    The grid is `points` even samples plus every market's kinks, so each
+    curve is exact at its breakpoints.  Curves are stored as `(markets,
+    points)` arrays, ready for a single `LineCollection` or one WebGL trace
+    per market.  `nearest` answers hover queries with a binary search over
+    the curves sorted at the hovered column instead of scanning every trace.
+    """
+
+    def __init__(self, configs, points=512):
+        self.configs = list(configs)
+        self.names = [config.get('name') or f"market-{i}" for i, config in enumerate(self.configs)]
+        self.models = [RateModel.from_config(config) for config in self.configs]
+
+        grid = [np.linspace(0, 100, points)] + [breakpoints(model) for model in self.models]
+        self.utilization = np.unique(np.concatenate(grid))
+        aprs = {side: np.empty((len(self.models), len(self.utilization))) for side in SIDES}
+        for i, model in enumerate(self.models):
+            borrow_rates, supply_rates = model.rates(self.utilization)
+            aprs['borrow'][i] = borrow_rates * SECONDS_PER_YEAR
+            aprs['supply'][i] = supply_rates * SECONDS_PER_YEAR
+        self.aprs = aprs
+
+        self.visible = np.ones(len(self.models), dtype=bool)
+        self._sorted = {}
+        self._sparse = {}
+
+    def __len__(self):
+        return len(self.models)
+
+    def matches(self, pattern='', selected=None):
+        """Mask of markets whose name contains `pattern` (case-insensitive), optionally limited to `selected` names.
+
+        Leaves `visible` alone, so an overlay shared between sessions can be filtered per session.
+        """
+        pattern = pattern.lower()
+        selected = set(selected) if selected is not None else None
+        return np.array([pattern in name.lower() and (selected is None or name in selected)
+                         for name in self.names], dtype=bool)
+
+    def set_filter(self, pattern='', selected=None):
+        """Show only the markets `matches` picks."""
+        self.visible = self.matches(pattern, selected)
+        self._sorted.clear()
+        return self.visible
+
+    def sparse_curve(self, index, side='borrow'):
+        """Fewest `(utilization, APR)` points that draw one market's curve.
+
+        The borrow curve is linear between its breakpoints; the supply curve
+        takes `sampling.exact_samples`.  A handful of points per market
+        instead of the shared grid keeps a WebGL trace per market cheap to
+        serialize.
+        """
+        key = (index, side)
+        if key not in self._sparse:
+            model = self.models[index]
+            utilization = breakpoints(model) if side == 'borrow' else exact_samples(model)
+            rates = model.rates(utilization)[SIDES.index(side)]
+            self._sparse[key] = (utilization, rates * SECONDS_PER_YEAR)
+        return self._sparse[key]
+
+    def visible_indices(self):
+        return np.flatnonzero(self.visible)
+
+    def segments(self, side='borrow'):
+        """`(visible markets, points, 2)` vertex array for a `LineCollection`."""
+        values = self.aprs[side][self.visible]
+        x = np.broadcast_to(self.utilization, values.shape)
+        return np.stack((x, values), axis=-1)
+
+    def _sorted_columns(self, side):
+        if side not in self._sorted:
+            indices = self.visible_indices()
+            values = self.aprs[side][indices]
+            order = np.argsort(values, axis=0)
+            self._sorted[side] = (indices[order], np.take_along_axis(values, order, axis=0))
+        return self._sorted[side]
+
+    def nearest(self, utilization, apr, side='borrow'):
+        """Index of the visible market whose curve passes closest to `apr` at `utilization`, or None."""
+        markets, values = self._sorted_columns(side)
+        if not len(markets):
+            return None
+        column = int(np.clip(np.searchsorted(self.utilization, utilization), 0, len(self.utilization) - 1))
+        if column and utilization - self.utilization[column - 1] < self.utilization[column] - utilization:
+            column -= 1
+        position = np.searchsorted(values[:, column], apr)
+        candidates = [p for p in (position - 1, position) if 0 <= p < len(markets)]
+        best = min(candidates, key=lambda p: abs(values[p, column] - apr))
+        return int(markets[best, column])
@@ -0,0 +1,133 @@
+import sys
+import tkinter as tk
+from tkinter import filedialog, ttk
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.collections import LineCollection
+import numpy as np
+from market_overlay import MarketOverlay
+from rate_engine import load_configs
+
+class MarketOverlayApp:
+    def __init__(self, root, config_path=None):
+        self.root = root
+        self.root.title("Multi-Market Rate Comparison")
+        self.root.geometry("900x650")
+
+        self.create_input_fields()
+
+        self.figure, self.ax = plt.subplots(figsize=(6, 4))
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.root)
+        self.canvas.get_tk_widget().grid(row=3, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+        self.canvas.mpl_connect('motion_notify_event', self.on_hover)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        self.status_label = ttk.Label(self.root, text="")
+        self.status_label.grid(row=4, column=0, columnspan=3, padx=10, pady=(0, 5), sticky="w")
+
+        self.overlay = None
+        self.collection = None
+        self.highlight = None
+        self.annotation = None
+        self.background = None
+
+        self.root.grid_rowconfigure(3, weight=1)
+        self.root.grid_columnconfigure(1, weight=1)
+
+        if config_path:
+            self.config_path.set(config_path)
+            self.load_markets()
+
+    def create_input_fields(self):
+        ttk.Label(self.root, text="Market Config (JSON/YAML)").grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.config_path = tk.StringVar(value="")
+        ttk.Entry(self.root, textvariable=self.config_path).grid(row=0, column=1, padx=10, pady=5, sticky="ew")
+        ttk.Button(self.root, text="Browse...", command=self.browse).grid(row=0, column=2, padx=10, pady=5)
+
+        ttk.Label(self.root, text="Filter Markets").grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.filter_text = tk.StringVar(value="")
+        self.filter_text.trace_add('write', lambda *args: self.update_plot())
+        ttk.Entry(self.root, textvariable=self.filter_text).grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+
+        ttk.Label(self.root, text="Curve").grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        side_frame = ttk.Frame(self.root)
+        side_frame.grid(row=2, column=1, padx=10, pady=5, sticky="w")
+        self.side = tk.StringVar(value='borrow')
+        for text, value in (("Borrow APR", 'borrow'), ("Supply APR", 'supply')):
+            ttk.Radiobutton(side_frame, text=text, variable=self.side, value=value,
+                            command=self.update_plot).pack(side=tk.LEFT, padx=(0, 10))
+
+    def browse(self):
+        path = filedialog.askopenfilename(filetypes=[("Market configs", "*.json *.yaml *.yml"), ("All files", "*")])
+        if path:
+            self.config_path.set(path)
+            self.load_markets()
+
+    def load_markets(self):
+        self.overlay = MarketOverlay(load_configs(self.config_path.get()))
+        self.collection = None
+        self.update_plot()
+
+    def update_plot(self, *args):
+        if self.overlay is None:
+            return
+        self.overlay.set_filter(self.filter_text.get())
+        segments = self.overlay.segments(self.side.get())
+        colors = plt.cm.viridis(np.linspace(0, 1, len(self.overlay)))[self.overlay.visible]
+
+        if self.collection is None:
+            self.ax.clear()
+            self.collection = LineCollection(segments, colors=colors, linewidths=0.8)
+            self.ax.add_collection(self.collection)
+            # Hover artists are animated and blitted over the cached collection
+            self.highlight, = self.ax.plot([], [], '-', color='red', linewidth=2, animated=True)
+            self.annotation = self.ax.annotate("", xy=(0, 0), xytext=(10, 10), textcoords='offset points',
+                                               bbox=dict(boxstyle='round', fc='w'), animated=True)
+            self.annotation.set_visible(False)
+            self.ax.set_xlabel('Utilization (%)')
+            self.ax.set_xlim(0, 100)
+        else:
+            self.collection.set_segments(segments)
+            self.collection.set_color(colors)
+
+        self.ax.set_title(f"{self.side.get().title()} APR ({int(self.overlay.visible.sum())} of {len(self.overlay)} markets)")
+        self.ax.set_ylabel('APR (%)')
+        self.highlight.set_data([], [])
+        self.annotation.set_visible(False)
+        values = segments[..., 1]
+        if values.size:
+            self.ax.set_ylim(min(0, values.min()), values.max() * 1.05 or 1)
+        self.canvas.draw_idle()
+
+    def on_hover(self, event):
+        if self.overlay is None or event.inaxes is not self.ax or event.xdata is None:
+            return
+        side = self.side.get()
+        market = self.overlay.nearest(event.xdata, event.ydata, side)
+        if market is None:
+            return
+
+        quote = self.overlay.models[market].quote(event.xdata)
+        apr = quote.borrow_apr if side == 'borrow' else quote.supply_apr
+        self.highlight.set_data(self.overlay.utilization, self.overlay.aprs[side][market])
+        self.annotation.xy = (event.xdata, apr)
+        self.annotation.set_text(f'{self.overlay.names[market]}\nUtilization: {event.xdata:.2f}%\n'
+                                 f'Borrow APR: {quote.borrow_apr:.2f}%\nSupply APR: {quote.supply_apr:.2f}%')
+        self.annotation.set_visible(True)
+        self.status_label.config(text=self.overlay.names[market])
+
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.highlight)
+        self.ax.draw_artist(self.annotation)
+        self.canvas.blit(self.figure.bbox)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = MarketOverlayApp(root, sys.argv[1] if len(sys.argv) > 1 else None)
+    root.mainloop()
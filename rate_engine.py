@@ -0,0 +1,239 @@
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+SECONDS_PER_YEAR = 31536000
+
+RateQuote = namedtuple('RateQuote', 'utilization borrow_rate supply_rate borrow_apr supply_apr')
+
+
+def _segments(base_rate, kinks, slopes):
+    # Segment i starts at starts[i] with rate offsets[i] and slope slopes[i].
+    # Kinks are used as the apps use them: a point belongs to the first
+    # segment whose upper kink it does not exceed, so unsorted kinks behave
+    # exactly like the original if/elif chains.
+    base_rate = np.asarray(base_rate, dtype=float)
+    kinks = np.asarray(kinks, dtype=float)
+    slopes = np.asarray(slopes, dtype=float)
+    if slopes.shape[-1] != kinks.shape[-1] + 1:
+        raise ValueError("need exactly one more slope than kinks")
+
+    zero = np.zeros(kinks.shape[:-1] + (1,))
+    starts = np.concatenate((zero, kinks), axis=-1)
+    widths = np.diff(starts, axis=-1)
+    offsets = np.empty(np.broadcast_shapes(starts.shape, slopes.shape, base_rate.shape + (1,)))
+    offsets[..., 0] = base_rate
+    for i in range(1, offsets.shape[-1]):
+        offsets[..., i] = offsets[..., i - 1] + widths[..., i - 1] * slopes[..., i - 1]
+    bounds = np.maximum.accumulate(kinks, axis=-1)
+    return starts, offsets, slopes, bounds
+
+
+def piecewise_rates(utilization, base_rate, kinks, slopes):
+    """Evaluate a piecewise-linear rate curve with any number of kinks.
+
+    `utilization` is in percent.  Parameters may carry leading batch
+    dimensions (`kinks[..., k]`, `slopes[..., k + 1]`, `base_rate[...]`), in
+    which case the result has shape `batch + utilization.shape`.
+    """
+    return _evaluate(utilization, _segments(base_rate, kinks, slopes))
+
+
+def _evaluate(utilization, segments):
+    utilization = np.asarray(utilization, dtype=float)
+    starts, offsets, slopes, bounds = segments
+    batch = offsets.shape[:-1]
+
+    if not batch:
+        index = np.searchsorted(bounds, utilization, side="left")
+        return offsets[index] + (utilization - starts[index]) * slopes[index]
+
+    flat_u = utilization.reshape(-1)
+    expand = (Ellipsis, None)
+    index = np.zeros(batch + flat_u.shape, dtype=np.intp)
+    for i in range(bounds.shape[-1]):
+        index += flat_u > np.broadcast_to(bounds[..., i], batch)[expand]
+    starts = np.broadcast_to(starts, offsets.shape)
+    slopes = np.broadcast_to(slopes, offsets.shape)
+    rates = (np.take_along_axis(offsets, index, axis=-1)
+             + (flat_u - np.take_along_axis(starts, index, axis=-1))
+             * np.take_along_axis(slopes, index, axis=-1))
+    return rates.reshape(batch + utilization.shape)
+
+
+def supply_from_borrow(utilization, borrow_rates, reserve_factor):
+    """Supply rate implied by a borrow curve and a reserve factor in percent."""
+    utilization = np.asarray(utilization, dtype=float)
+    return borrow_rates * (utilization / 100) * (1 - np.asarray(reserve_factor, dtype=float) / 100.0)
+
+
+class RateCurve:
+    def __init__(self, base_rate, kinks, slopes):
+        self.base_rate = float(base_rate)
+        self.kinks = tuple(float(k) for k in kinks)
+        self.slopes = tuple(float(s) for s in slopes)
+        self._segments = _segments(self.base_rate, self.kinks, self.slopes)
+
+    def __call__(self, utilization):
+        return _evaluate(utilization, self._segments)
+
+    def coefficients(self, utilization):
+        """Intercept and slope of the linear piece that applies at `utilization`."""
+        starts, offsets, slopes, bounds = self._segments
+        index = np.searchsorted(bounds, utilization, side="left")
+        return offsets[index] - starts[index] * slopes[index], slopes[index]
+
+    def breakpoints(self):
+        """Utilizations in [0, 100] where the curve can change slope, including both ends."""
+        bounds = np.clip(self._segments[3], 0, 100)
+        return np.unique(np.concatenate(([0.0], bounds, [100.0])))
+
+    def __repr__(self):
+        return f"RateCurve(base_rate={self.base_rate!r}, kinks={self.kinks!r}, slopes={self.slopes!r})"
+
+
+class RateModel:
+    """Borrow curve plus either a reserve factor or an independent supply curve.
+
+    `reserve_factor` is in percent.  When `supply` is given (the separated
+    model) the supply rate comes from that curve and the reserve factor is
+    ignored.  `min_rate` clamps the borrow rate from below before the supply
+    rate is derived, as the Streamlit app does with `max(0, borrow_rate)`.
+    """
+
+    def __init__(self, borrow, reserve_factor=0.0, supply=None, min_rate=None):
+        self.borrow = borrow
+        self.reserve_factor = float(reserve_factor)
+        self.supply = supply
+        self.min_rate = min_rate
+
+    @classmethod
+    def jump_rate(cls, base_rate, low_slope, high_slope, u_optimal, reserve_factor, min_rate=None):
+        return cls(RateCurve(base_rate, [u_optimal], [low_slope, high_slope]), reserve_factor, min_rate=min_rate)
+
+    @classmethod
+    def double_jump_rate(cls, base_rate, low_slope, first_jump_slope, second_jump_slope,
+                         first_kink, second_kink, reserve_factor, min_rate=None):
+        curve = RateCurve(base_rate, [first_kink, second_kink], [low_slope, first_jump_slope, second_jump_slope])
+        return cls(curve, reserve_factor, min_rate=min_rate)
+
+    @classmethod
+    def separated(cls, base_borrow_rate, low_slope_borrow, high_slope_borrow,
+                  base_supply_rate, low_slope_supply, high_slope_supply, u_optimal):
+        borrow = RateCurve(base_borrow_rate, [u_optimal], [low_slope_borrow, high_slope_borrow])
+        supply = RateCurve(base_supply_rate, [u_optimal], [low_slope_supply, high_slope_supply])
+        return cls(borrow, supply=supply)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a model from a plain dict such as one loaded from JSON.
+
+        `config['model']` selects `jump_rate` (default), `double_jump_rate`,
+        `separated` or `piecewise`; the remaining keys are the arguments of
+        the matching constructor.  A `name` key is ignored.
+        """
+        config = dict(config)
+        config.pop('name', None)
+        kind = config.pop('model', 'jump_rate')
+        if kind == 'piecewise':
+            borrow = RateCurve(config.pop('base_rate'), config.pop('kinks'), config.pop('slopes'))
+            supply = config.pop('supply', None)
+            return cls(borrow, supply=RateCurve(**supply) if supply else None, **config)
+        factories = {'jump_rate': cls.jump_rate, 'double_jump_rate': cls.double_jump_rate, 'separated': cls.separated}
+        if kind not in factories:
+            raise ValueError(f"unknown model {kind!r}")
+        return factories[kind](**config)
+
+    def borrow_rate(self, utilization):
+        rates = self.borrow(utilization)
+        if self.min_rate is not None:
+            rates = np.maximum(rates, self.min_rate)
+        return rates
+
+    def supply_rate(self, utilization):
+        return self.rates(utilization)[1]
+
+    def rates(self, utilization):
+        utilization = np.asarray(utilization, dtype=float)
+        borrow_rates = self.borrow_rate(utilization)
+        if self.supply is not None:
+            return borrow_rates, self.supply(utilization)
+        return borrow_rates, supply_from_borrow(utilization, borrow_rates, self.reserve_factor)
+
+    def quote(self, utilization):
+        """Exact rates and APRs at any utilization, scalar or array.
+
+        Each point costs one binary search over the kinks, independent of how
+        densely the curve is plotted.
+        """
+        utilization = np.asarray(utilization, dtype=float)
+        borrow_rates, supply_rates = self.rates(utilization)
+        return RateQuote(utilization, borrow_rates, supply_rates,
+                         borrow_rates * SECONDS_PER_YEAR, supply_rates * SECONDS_PER_YEAR)
+
+    def utilization_for_apr(self, target_apr, side='borrow'):
+        """Smallest utilization at which the borrow or supply APR reaches `target_apr`.
+
+        The curve must be non-decreasing on [0, 100]; targets it never reaches
+        give NaN.  `min_rate` is not applied by the inverse.
+        """
+        if side not in ('borrow', 'supply'):
+            raise ValueError("side must be 'borrow' or 'supply'")
+        target = np.asarray(target_apr, dtype=float) / SECONDS_PER_YEAR
+        quadratic = side == 'supply' and self.supply is None
+        curve = self.supply if side == 'supply' and self.supply is not None else self.borrow
+
+        points = curve.breakpoints()
+        values = curve(points)
+        if quadratic:
+            values = supply_from_borrow(points, values, self.reserve_factor)
+        piece = np.clip(np.searchsorted(values, target, side="left") - 1, 0, len(points) - 2)
+        low, high = points[piece], points[piece + 1]
+        intercept, slope = curve.coefficients((low + high) / 2)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if quadratic:
+                # supply = scale * (intercept * U + slope * U**2), take the root in [low, high]
+                scale = (1 - self.reserve_factor / 100.0) / 100
+                scaled = target / scale
+                result = 2 * scaled / (intercept + np.sqrt(intercept * intercept + 4 * slope * scaled))
+                result = np.where(scaled == 0, 0.0, result)
+            else:
+                result = np.where(slope == 0, low, (target - intercept) / np.where(slope == 0, 1, slope))
+        result = np.clip(result, low, high)
+        return np.where((target < values[0]) | (target > values[-1]), np.nan, result)
+
+    def __repr__(self):
+        return (f"RateModel(borrow={self.borrow!r}, reserve_factor={self.reserve_factor!r}, "
+                f"supply={self.supply!r}, min_rate={self.min_rate!r})")
+
+
+def config_format(path):
+    """`'yaml'` for `.yaml`/`.yml` paths, `'json'` otherwise."""
+    return 'yaml' if os.path.splitext(path)[1].lower() in ('.yaml', '.yml') else 'json'
+
+
+def parse_configs(data, format='json'):
+    """Model configs from JSON or YAML (needs `pyyaml`) text, as `str` or `bytes`.
+
+    The document holds one config, a list of them or a mapping with a
+    `markets` list; each config is accepted by `RateModel.from_config`,
+    with an optional `name`.
+    """
+    if format == 'yaml':
+        import yaml
+
+        configs = yaml.safe_load(data)
+    else:
+        configs = json.loads(data)
+    if isinstance(configs, dict):
+        configs = configs.get('markets', [configs])
+    return configs
+
+
+def load_configs(path):
+    """`parse_configs` for a file, with the format taken from its extension."""
+    with open(path, 'rb') as f:
+        return parse_configs(f.read(), config_format(path))
@@ -0,0 +1,90 @@
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR, piecewise_rates, supply_from_borrow
+
+QUANTITIES = ('borrow_rate', 'supply_rate', 'borrow_apr', 'supply_apr')
+
+# Upper bound on parameter sets x utilization points evaluated per pass
+DEFAULT_CHUNK_ELEMENTS = 1 << 22
+
+
+def parameter_grid(**params):
+    """Cartesian product of scalar or 1-D parameter values.
+
+    Returns `(shape, flat)` where `shape` holds the length of every array
+    parameter in keyword order and `flat` maps each name to a 1-D array with
+    one entry per parameter set.
+    """
+    names = list(params)
+    values = [np.atleast_1d(np.asarray(params[name], dtype=float)) for name in names]
+    shape = tuple(len(v) for name, v in zip(names, values) if np.ndim(params[name]) > 0)
+    grids = np.meshgrid(*values, indexing='ij')
+    return shape, {name: grid.reshape(-1) for name, grid in zip(names, grids)}
+
+
+def sweep_rates(utilization, base_rate, kinks, slopes, reserve_factor, quantity='supply_apr',
+                chunk_elements=DEFAULT_CHUNK_ELEMENTS, min_rate=None, out=None):
+    """Evaluate many parameter sets over one utilization grid.
+
+    `base_rate[n]`, `kinks[n, k]`, `slopes[n, k + 1]` and `reserve_factor[n]`
+    describe `n` parameter sets (scalars broadcast).  The result has shape
+    `(n, len(utilization))` and is filled in chunks of at most
+    `chunk_elements` values, so `out` may be a memory-mapped array.
+    `min_rate` clamps the borrow rate as in `RateModel`.
+    """
+    if quantity not in QUANTITIES:
+        raise ValueError(f"quantity must be one of {QUANTITIES}")
+    utilization = np.asarray(utilization, dtype=float)
+    kinks = np.atleast_2d(np.asarray(kinks, dtype=float))
+    slopes = np.atleast_2d(np.asarray(slopes, dtype=float))
+    n, = np.broadcast_shapes(np.shape(base_rate), np.shape(reserve_factor), kinks.shape[:1], slopes.shape[:1], (1,))
+    base_rate = np.broadcast_to(np.asarray(base_rate, dtype=float), (n,))
+    reserve_factor = np.broadcast_to(np.asarray(reserve_factor, dtype=float), (n,))
+    kinks = np.broadcast_to(kinks, (n, kinks.shape[1]))
+    slopes = np.broadcast_to(slopes, (n, slopes.shape[1]))
+
+    if out is None:
+        out = np.empty((n, len(utilization)))
+    rows = max(1, chunk_elements // max(1, len(utilization)))
+    for start in range(0, n, rows):
+        part = slice(start, min(start + rows, n))
+        rates = piecewise_rates(utilization, base_rate[part], kinks[part], slopes[part])
+        if min_rate is not None:
+            rates = np.maximum(rates, min_rate)
+        if quantity.startswith('supply'):
+            rates = supply_from_borrow(utilization, rates, reserve_factor[part, None])
+        if quantity.endswith('apr'):
+            rates *= SECONDS_PER_YEAR
+        out[part] = rates
+    return out
+
+
+def jump_rate_sweep(utilization, base_rate, low_slope, high_slope, u_optimal, reserve_factor,
+                    quantity='supply_apr', chunk_elements=DEFAULT_CHUNK_ELEMENTS, min_rate=None):
+    """Sweep the 2-slope model; every array argument becomes one grid axis.
+
+    The result has one axis per array argument (in signature order) followed
+    by the utilization axis.
+    """
+    shape, grid = parameter_grid(base_rate=base_rate, low_slope=low_slope, high_slope=high_slope,
+                                 u_optimal=u_optimal, reserve_factor=reserve_factor)
+    kinks = grid['u_optimal'][:, None]
+    slopes = np.stack((grid['low_slope'], grid['high_slope']), axis=-1)
+    result = sweep_rates(utilization, grid['base_rate'], kinks, slopes, grid['reserve_factor'],
+                         quantity, chunk_elements, min_rate)
+    return result.reshape(shape + (len(utilization),))
+
+
+def double_jump_rate_sweep(utilization, base_rate, low_slope, first_jump_slope, second_jump_slope,
+                           first_kink, second_kink, reserve_factor,
+                           quantity='supply_apr', chunk_elements=DEFAULT_CHUNK_ELEMENTS, min_rate=None):
+    """Sweep the 3-slope model; see `jump_rate_sweep` for the result layout."""
+    shape, grid = parameter_grid(base_rate=base_rate, low_slope=low_slope,
+                                 first_jump_slope=first_jump_slope, second_jump_slope=second_jump_slope,
+                                 first_kink=first_kink, second_kink=second_kink,
+                                 reserve_factor=reserve_factor)
+    kinks = np.stack((grid['first_kink'], grid['second_kink']), axis=-1)
+    slopes = np.stack((grid['low_slope'], grid['first_jump_slope'], grid['second_jump_slope']), axis=-1)
+    result = sweep_rates(utilization, grid['base_rate'], kinks, slopes, grid['reserve_factor'],
+                         quantity, chunk_elements, min_rate)
+    return result.reshape(shape + (len(utilization),))
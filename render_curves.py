@@ -0,0 +1,73 @@
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from rate_engine import RateModel, load_configs
+from sampling import sample_curves
+
+
+def _file_stem(config, index):
+    name = config.get('name') or f"market-{index}"
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+
+
+def render_curve(config, path, points=100, dpi=100, sampling='exact'):
+    # Imported here so the parent process never pays for matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    model = RateModel.from_config(config)
+    utilization, borrow_rates, supply_rates = sample_curves(model, sampling, points, max_points=2000)
+
+    figure = Figure(figsize=(5, 3))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    ax.plot(utilization, borrow_rates, '-b', label='Borrow Rate')
+    ax.plot(utilization, supply_rates, '-r', label='Supply Rate')
+    ax.set_title(config.get('name') or 'Borrow and Supply Rates')
+    ax.set_xlabel('Utilization (%)')
+    ax.set_ylabel('Rate (per unit of time)')
+    ax.legend()
+    figure.tight_layout()
+    figure.savefig(path, dpi=dpi)
+    return path
+
+
+def _render_task(task):
+    return render_curve(*task)
+
+
+def render_all(configs, output_dir, formats=('png',), points=100, dpi=100, workers=None, sampling='exact'):
+    """Render every config in every format, spread over a process pool."""
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(config, os.path.join(output_dir, f"{_file_stem(config, i)}.{fmt}"), points, dpi, sampling)
+             for i, config in enumerate(configs) for fmt in formats]
+    if workers == 1:
+        return [_render_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_task, tasks, chunksize=4))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render rate curves to image files without a display.")
+    parser.add_argument('config', help="JSON or YAML file with model configs")
+    parser.add_argument('-o', '--output-dir', default='curves')
+    parser.add_argument('-f', '--format', action='append', choices=('png', 'svg'),
+                        help="output format, may be repeated (default: png)")
+    parser.add_argument('--sampling', choices=('exact', 'grid'), default='exact',
+                        help="sample the kinks exactly or use an even grid of --points")
+    parser.add_argument('--points', type=int, default=100, help="utilization samples per curve with --sampling grid")
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    paths = render_all(load_configs(args.config), args.output_dir, formats=args.format or ['png'],
+                       points=args.points, dpi=args.dpi, workers=args.workers, sampling=args.sampling)
+    for path in paths:
+        print(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
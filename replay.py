@@ -0,0 +1,172 @@
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR, RateModel, load_configs
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+SUMMARY_COLUMNS = ('count', 'mean_utilization', 'mean_borrow_apr', 'mean_supply_apr', 'max_borrow_apr')
+
+
+def _iter_npy(path, columns, chunk_size):
+    data = np.load(path, mmap_mode='r')
+    if data.dtype.names is None and set(columns) != {'utilization'}:
+        raise ValueError(f"{path} is a plain array; only a utilization column is available")
+    for start in range(0, len(data), chunk_size):
+        part = data[start:start + chunk_size]
+        if data.dtype.names is None:
+            yield {'utilization': np.asarray(part)}
+        else:
+            yield {key: np.asarray(part[name]) for key, name in columns.items()}
+
+
+def _iter_parquet(path, columns, chunk_size):
+    import pyarrow.parquet as pq
+
+    names = list(columns.values())
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=names):
+        yield {key: batch.column(names.index(name)).to_numpy(zero_copy_only=False)
+               for key, name in columns.items()}
+
+
+def _iter_csv(path, columns, chunk_size):
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    if pd is not None:
+        for frame in pd.read_csv(path, usecols=list(columns.values()), chunksize=chunk_size):
+            yield {key: frame[name].to_numpy() for key, name in columns.items()}
+        return
+
+    with open(path, newline='') as f:
+        rows = {key: [] for key in columns}
+        for row in csv.DictReader(f):
+            for key, name in columns.items():
+                rows[key].append(row[name])
+            if len(rows['utilization']) == chunk_size:
+                yield _csv_chunk(rows)
+                rows = {key: [] for key in columns}
+        if rows['utilization']:
+            yield _csv_chunk(rows)
+
+
+def _csv_chunk(rows):
+    chunk = {key: np.asarray(values) for key, values in rows.items()}
+    for key in ('utilization', 'timestamp'):
+        if key in chunk:
+            chunk[key] = chunk[key].astype(float)
+    return chunk
+
+
+def iter_chunks(path, utilization_column='utilization', time_column=None, market_column=None,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a CSV, Parquet or .npy file as dicts of column arrays.
+
+    `.npy` files are memory-mapped; structured arrays are addressed by field
+    name and plain 1-D arrays are read as utilization only.  Parquet needs
+    `pyarrow`; CSV uses `pandas` when it is installed.  Chunks always carry
+    `utilization`, plus `timestamp` and `market` when those columns are given.
+    """
+    columns = {'utilization': utilization_column}
+    if time_column:
+        columns['timestamp'] = time_column
+    if market_column:
+        columns['market'] = market_column
+
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.npy':
+        return _iter_npy(path, columns, chunk_size)
+    if suffix in ('.parquet', '.pq'):
+        return _iter_parquet(path, columns, chunk_size)
+    if suffix == '.csv':
+        return _iter_csv(path, columns, chunk_size)
+    raise ValueError(f"unsupported file type {suffix!r}")
+
+
+def replay(model, path, by=None, utilization_column='utilization', time_column='timestamp',
+           market_column='market', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Evaluate `model` on every row of a history file and aggregate the rates.
+
+    `by` is `None` (one group), `'day'` (UTC day of a Unix-seconds timestamp
+    column) or `'market'`.  Returns a dict of arrays with one entry per group,
+    sorted by group key: `group` plus the `SUMMARY_COLUMNS`.
+    """
+    if by not in (None, 'day', 'market'):
+        raise ValueError("by must be None, 'day' or 'market'")
+    chunks = iter_chunks(path, utilization_column,
+                         time_column=time_column if by == 'day' else None,
+                         market_column=market_column if by == 'market' else None,
+                         chunk_size=chunk_size)
+
+    totals = {}
+    for chunk in chunks:
+        utilization = np.asarray(chunk['utilization'], dtype=float)
+        borrow_rates, supply_rates = model.rates(utilization)
+
+        if by == 'day':
+            keys, inverse = np.unique(np.floor_divide(chunk['timestamp'], 86400).astype(np.int64),
+                                      return_inverse=True)
+        elif by == 'market':
+            keys, inverse = np.unique(chunk['market'], return_inverse=True)
+        else:
+            keys, inverse = np.array([None]), np.zeros(len(utilization), dtype=np.intp)
+
+        groups = len(keys)
+        counts = np.bincount(inverse, minlength=groups)
+        sum_utilization = np.bincount(inverse, utilization, minlength=groups)
+        sum_borrow = np.bincount(inverse, borrow_rates, minlength=groups)
+        sum_supply = np.bincount(inverse, supply_rates, minlength=groups)
+        max_borrow = np.full(groups, -np.inf)
+        np.maximum.at(max_borrow, inverse, borrow_rates)
+
+        for i, key in enumerate(keys.tolist()):
+            total = totals.setdefault(key, [0, 0.0, 0.0, 0.0, -np.inf])
+            total[0] += counts[i]
+            total[1] += sum_utilization[i]
+            total[2] += sum_borrow[i]
+            total[3] += sum_supply[i]
+            total[4] = max(total[4], max_borrow[i])
+
+    keys = sorted(totals, key=lambda key: (key is None, key))
+    values = np.array([totals[key] for key in keys], dtype=float).reshape(len(keys), 5)
+    counts = values[:, 0]
+    return {
+        'group': np.array(keys, dtype=object),
+        'count': counts.astype(np.int64),
+        'mean_utilization': values[:, 1] / counts,
+        'mean_borrow_apr': values[:, 2] / counts * SECONDS_PER_YEAR,
+        'mean_supply_apr': values[:, 3] / counts * SECONDS_PER_YEAR,
+        'max_borrow_apr': values[:, 4] * SECONDS_PER_YEAR,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay historical utilization through rate models.")
+    parser.add_argument('history', help="CSV, Parquet or .npy file with utilization in percent")
+    parser.add_argument('--config', required=True, help="JSON or YAML file with model configs")
+    parser.add_argument('--by', choices=('day', 'market'), default=None)
+    parser.add_argument('--utilization-column', default='utilization')
+    parser.add_argument('--time-column', default='timestamp')
+    parser.add_argument('--market-column', default='market')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(('model', 'group') + SUMMARY_COLUMNS)
+    for i, config in enumerate(load_configs(args.config)):
+        summary = replay(RateModel.from_config(config), args.history, by=args.by,
+                         utilization_column=args.utilization_column, time_column=args.time_column,
+                         market_column=args.market_column, chunk_size=args.chunk_size)
+        name = config.get('name', f"model-{i}")
+        for row in range(len(summary['group'])):
+            writer.writerow([name, summary['group'][row]] + [summary[column][row] for column in SUMMARY_COLUMNS])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR, RateCurve, RateModel
+
+DEFAULT_TOLERANCE = 1e-3
+
+
+def _clamp_crossings(model, points):
+    # Where the unclamped borrow curve crosses `min_rate` the clamped curve bends
+    if model.min_rate is None:
+        return np.empty(0)
+    midpoints = (points[:-1] + points[1:]) / 2
+    intercept, slope = model.borrow.coefficients(midpoints)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossings = (model.min_rate - intercept) / slope
+    inside = (slope != 0) & (crossings > points[:-1]) & (crossings < points[1:])
+    return crossings[inside]
+
+
+def breakpoints(model):
+    """Utilizations in [0, 100] where the borrow or supply curve changes formula."""
+    points = model.borrow.breakpoints()
+    if model.supply is not None:
+        points = np.union1d(points, model.supply.breakpoints())
+    return np.union1d(points, _clamp_crossings(model, points))
+
+
+def exact_samples(model, tolerance=DEFAULT_TOLERANCE):
+    """Fewest utilizations that draw both curves within `tolerance`.
+
+    Both curves are linear between breakpoints except the reserve-factor
+    supply curve, which is quadratic there: a chord over width `h` strays at
+    most `|f''| * h**2 / 8` from it, so each such segment is split evenly into
+    just enough pieces to keep that under `tolerance` times the peak supply
+    rate.  Borrow kinks always land exactly on a sample.
+    """
+    points = breakpoints(model)
+    if model.supply is not None:
+        return points
+
+    _, supply_rates = model.rates(points)
+    peak = np.max(np.abs(supply_rates))
+    if peak == 0:
+        return points
+    scale = (1 - model.reserve_factor / 100.0) / 100
+    samples = [points[:1]]
+    for low, high in zip(points[:-1], points[1:]):
+        middle = (low + high) / 2
+        _, slope = model.borrow.coefficients(middle)
+        if model.min_rate is not None and model.borrow(middle) < model.min_rate:
+            slope = 0.0
+        curvature = abs(2 * scale * slope)
+        pieces = max(1, int(np.ceil(np.sqrt(curvature * (high - low) ** 2 / (8 * tolerance * peak)))))
+        samples.append(np.linspace(low, high, pieces + 1)[1:])
+    return np.concatenate(samples)
+
+
+def lttb(x, y, threshold):
+    """Indices of `threshold` points chosen by Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last point and, from each bucket in between, the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.intp)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_start, next_stop = stop, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        average_x = x[next_start:next_stop].mean()
+        average_y = y[next_start:next_stop].mean()
+        area = np.abs((x[previous] - average_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (average_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def sample_curves(model, mode='exact', points=100, max_points=None, tolerance=DEFAULT_TOLERANCE):
+    """Utilization, borrow and supply arrays ready to hand to a renderer.
+
+    `mode='exact'` uses `exact_samples`; `mode='grid'` evaluates `points`
+    evenly spaced utilizations and, when that exceeds `max_points`, keeps the
+    union of the LTTB picks for both curves so they still share one x array.
+    """
+    if mode == 'exact':
+        utilization = exact_samples(model, tolerance)
+        return (utilization,) + tuple(model.rates(utilization))
+    if mode != 'grid':
+        raise ValueError("mode must be 'exact' or 'grid'")
+
+    utilization = np.linspace(0, 100, points)
+    borrow_rates, supply_rates = model.rates(utilization)
+    if max_points and points > max_points:
+        keep = np.union1d(lttb(utilization, borrow_rates, max_points // 2),
+                          lttb(utilization, supply_rates, max_points // 2))
+        utilization, borrow_rates, supply_rates = utilization[keep], borrow_rates[keep], supply_rates[keep]
+    return utilization, borrow_rates, supply_rates
+
+
+def jump_rate_curves(base_rate, low_slope, reserve_factor, jump_slopes, kinks, mode='exact', points=100,
+                     max_points=2000):
+    """Rates and APRs of a jump rate model with any number of kinks, floored at zero.
+
+    The uncached body of `calculate_rates` in the Streamlit app, kept here
+    so `benchmark.py` times the same path.  Returns utilization, borrow and
+    supply rates, then borrow and supply APRs (%).
+    """
+    model = RateModel(RateCurve(base_rate, kinks, (low_slope,) + tuple(jump_slopes)), reserve_factor, min_rate=0)
+    utilization, borrow_rates, supply_rates = sample_curves(model, mode, points, max_points)
+    return utilization, borrow_rates, supply_rates, borrow_rates * SECONDS_PER_YEAR, supply_rates * SECONDS_PER_YEAR
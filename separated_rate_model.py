@@ -2,8 +2,11 @@ import tkinter as tk
 from tkinter import ttk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-import mplcursors
+from curve_cache import CurveCache, default_store
+from rate_engine import RateModel
+from solvency import unsafe_regions
+from tk_calibrate import CalibrationDialog
+from tk_plot import CurvePlot
 
 class InterestRateApp:
     def __init__(self, root):
@@ -16,11 +19,23 @@ class InterestRateApp:
 
         self.plot_button = ttk.Button(self.root, text="Plot", command=self.update_plot)
         self.plot_button.grid(row=7, column=1, padx=10, pady=10, sticky="ew")
+        ttk.Button(self.root, text="Calibrate...", command=self.open_calibration).grid(row=7, column=0, padx=10, pady=10, sticky="w")
 
         self.figure, self.ax = plt.subplots(figsize=(5, 3))
         self.canvas = FigureCanvasTkAgg(self.figure, master=self.root)
         self.canvas.get_tk_widget().grid(row=8, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
 
+        # 'exact' samples the kinks themselves; 'grid' uses curve_points, thinned to max_plot_points
+        self.sampling = 'exact'
+        self.curve_points = 100
+        self.max_plot_points = 2000
+        # Slider drags read rows of a table precomputed over the whole slider range
+        self.precompute_sliders = True
+        self.curves = CurveCache(store=default_store())
+        self.plot = CurvePlot(self.root, self.ax, self.canvas, self.on_hover)
+        self.plot.create_status_bar(row=9)
+
+        self.model = None
         self.data_borrow = None
         self.data_supply = None
 
@@ -66,60 +81,47 @@ class InterestRateApp:
         self.slider_label = ttk.Label(slider_frame, text=f"{self.u_optimal.get()}%")
         self.slider_label.pack(side=tk.RIGHT, padx=(10, 0))
 
-    def update_slider_label(self, value):
+    def update_slider_label(self, value, slider=0):
         self.slider_label.config(text=f"{float(value):.2f}%")
-        self.update_plot()
-
-    def update_plot(self, *args):
-        base_borrow_rate = self.base_borrow_rate.get()
-        low_slope_borrow = self.low_slope_borrow.get()
-        high_slope_borrow = self.high_slope_borrow.get()
-        base_supply_rate = self.base_supply_rate.get()
-        low_slope_supply = self.low_slope_supply.get()
-        high_slope_supply = self.high_slope_supply.get()
-        u_optimal = self.u_optimal.get()
-
-        utilization = np.linspace(0, 100, 100)
-        borrow_rates = []
-        supply_rates = []
-
-        for U in utilization:
-            # Borrow Rate Calculation
-            if U <= u_optimal:
-                borrow_rate = base_borrow_rate + (U * low_slope_borrow)
-            else:
-                borrow_rate = base_borrow_rate + (low_slope_borrow * u_optimal) + ((U - u_optimal) * high_slope_borrow)
-
-            # Supply Rate Calculation
-            if U <= u_optimal:
-                supply_rate = base_supply_rate + (U * low_slope_supply)
-            else:
-                supply_rate = base_supply_rate + (low_slope_supply * u_optimal) + ((U - u_optimal) * high_slope_supply)
-                
-            borrow_rates.append(borrow_rate)
-            supply_rates.append(supply_rate)
-
-        self.ax.clear()
-        self.data_borrow, = self.ax.plot(utilization, borrow_rates, '-b', label='Borrow Rate')
-        self.data_supply, = self.ax.plot(utilization, supply_rates, '-r', label='Supply Rate')
-        self.ax.set_title('Borrow and Supply Rates')
-        self.ax.set_xlabel('Utilization (%)')
-        self.ax.set_ylabel('Rate (per unit of time)')
-        self.ax.legend()
-
-        # Add mplcursors to enable hover
-        self.cursor = mplcursors.cursor(self.ax)
-        self.cursor.connect("add", self.on_hover)
-
-        self.canvas.draw()
+        self.plot.schedule(lambda: self.update_plot(slider=slider))
+
+    def open_calibration(self):
+        fields = {'base_borrow_rate': self.base_borrow_rate, 'low_slope_borrow': self.low_slope_borrow,
+                  'high_slope_borrow': self.high_slope_borrow, 'base_supply_rate': self.base_supply_rate,
+                  'low_slope_supply': self.low_slope_supply, 'high_slope_supply': self.high_slope_supply,
+                  'u_optimal': self.u_optimal}
+        CalibrationDialog(self.root, 'separated', fields, ('u_optimal',),
+                          lambda: self.update_slider_label(self.u_optimal.get(), None))
+
+    def update_plot(self, *args, slider=None):
+        timer = self.plot.timer
+        with timer.phase('update_plot'):
+            with timer.phase('read_vars'):
+                base_borrow_rate = self.base_borrow_rate.get()
+                low_slope_borrow = self.low_slope_borrow.get()
+                high_slope_borrow = self.high_slope_borrow.get()
+                base_supply_rate = self.base_supply_rate.get()
+                low_slope_supply = self.low_slope_supply.get()
+                high_slope_supply = self.high_slope_supply.get()
+                u_optimal = self.u_optimal.get()
+
+            with timer.phase('model'):
+                self.model = RateModel.separated(base_borrow_rate, low_slope_borrow, high_slope_borrow,
+                                                 base_supply_rate, low_slope_supply, high_slope_supply, u_optimal)
+            with timer.phase('sample'):
+                if slider is not None and self.precompute_sliders:
+                    curves = self.curves.slider_curves(self.model, slider, self.curve_points)
+                else:
+                    curves = self.curves.curves(self.model, self.sampling, self.curve_points, self.max_plot_points)
+                utilization, borrow_rates, supply_rates = curves
+            self.data_borrow, self.data_supply = self.plot.draw(utilization, borrow_rates, supply_rates)
+            # Utilizations where suppliers earn more than borrowers pay in
+            self.plot.shade(unsafe_regions(self.model), 'Negative Reserve Spread')
 
     def on_hover(self, sel):
         x = sel.target[0]
-        borrow_rate_y = np.interp(x, np.linspace(0, 100, len(self.data_borrow.get_ydata())), self.data_borrow.get_ydata())
-        supply_rate_y = np.interp(x, np.linspace(0, 100, len(self.data_supply.get_ydata())), self.data_supply.get_ydata())
-        borrow_apr = borrow_rate_y * 31536000
-        supply_apr = supply_rate_y * 31536000
-        sel.annotation.set_text(f'Utilization: {x:.2f}%\nBorrow Rate: {borrow_rate_y:.2e} ({borrow_apr:.2f}%)\nSupply Rate: {supply_rate_y:.2e} ({supply_apr:.2f}%)')
+        quote = self.model.quote(x)
+        sel.annotation.set_text(f'Utilization: {x:.2f}%\nBorrow Rate: {quote.borrow_rate:.2e} ({quote.borrow_apr:.2f}%)\nSupply Rate: {quote.supply_rate:.2e} ({quote.supply_apr:.2f}%)')
 
 if __name__ == "__main__":
     root = tk.Tk()
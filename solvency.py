@@ -0,0 +1,204 @@
+import argparse
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR
+from rate_sweep import parameter_grid
+from sampling import breakpoints
+
+SolvencyReport = namedtuple('SolvencyReport', [
+    'unsafe',               # True where the reserve spread goes negative anywhere in [0, 100]
+    'starts',               # (..., regions) start of each unsafe utilization interval, NaN-padded
+    'ends',                 # (..., regions) matching ends
+    'unsafe_width',         # total width of the unsafe intervals (percentage points)
+    'worst_spread',         # minimum reserve spread over [0, 100] (APR %)
+    'worst_utilization',    # utilization where it occurs (%)
+])
+
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+
+def _quadratic_roots(a, b, c):
+    # Real roots of a*u**2 + b*u + c, NaN where missing; stable form, linear when a == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = np.sqrt(np.where(b * b - 4 * a * c >= 0, b * b - 4 * a * c, np.nan))
+        q = -0.5 * (b + np.copysign(root, b))
+        first = np.where(a == 0, -c / b, q / a)
+        second = np.where(a == 0, np.nan, c / q)
+    return first, second
+
+
+def _negative_intervals(a, b, c, low, high, regions):
+    """Merged intervals where `a*u**2 + b*u + c < 0` on consecutive pieces `[low, high]`.
+
+    Coefficients have shape `(n, pieces)`.  The roots inside each piece cut
+    it into at most three sub-intervals of constant sign, tested at their
+    midpoints; runs of negative sub-intervals are merged across pieces.
+    Returns NaN-padded `(n, regions)` starts and ends.
+    """
+    first, second = _quadratic_roots(a, b, c)
+    cuts = []
+    for root in (first, second):
+        cuts.append(np.where((root > low) & (root < high), root, high))
+    points = np.sort(np.stack([low, high] + cuts, axis=-1), axis=-1)
+
+    left, right = points[..., :-1], points[..., 1:]
+    middle = (left + right) / 2
+    negative = ((a[..., None] * middle + b[..., None]) * middle + c[..., None] < 0).reshape(len(a), -1)
+    left, right = left.reshape(len(a), -1), right.reshape(len(a), -1)
+
+    # Zero-width pieces take the sign before them so they do not split a run
+    valid = right > left
+    negative &= valid
+    source = np.maximum.accumulate(np.where(valid, np.arange(valid.shape[1]), 0), axis=1)
+    negative = np.take_along_axis(negative, source, axis=1)
+
+    before = np.pad(negative[:, :-1], ((0, 0), (1, 0)))
+    after = np.pad(negative[:, 1:], ((0, 0), (0, 1)))
+    starts = np.full((len(a), regions), np.nan)
+    ends = np.full((len(a), regions), np.nan)
+    for flags, values, out in ((negative & ~before, left, starts), (negative & ~after, right, ends)):
+        rows, columns = np.nonzero(flags)
+        ranks = np.cumsum(flags, axis=1)[rows, columns] - 1
+        out[rows, ranks] = values[rows, columns]
+    return starts, ends
+
+
+def _worst_spread(a, b, c, low, high):
+    # Minimum of each piece's quadratic: at an end or at the vertex of an upward parabola
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vertex = np.where(a > 0, -b / (2 * a), low)
+    vertex = np.clip(vertex, low, high)
+    candidates = np.stack([low, high, vertex], axis=-1)
+    values = ((a[..., None] * candidates + b[..., None]) * candidates + c[..., None]).reshape(len(a), -1)
+    candidates = candidates.reshape(len(a), -1)
+    worst = np.argmin(values, axis=1)
+    rows = np.arange(len(a))
+    return values[rows, worst], candidates[rows, worst]
+
+
+def _report(a, b, c, low, high, regions):
+    starts, ends = _negative_intervals(a, b, c, low, high, regions)
+    worst, where = _worst_spread(a, b, c, low, high)
+    width = np.nansum(ends - starts, axis=1)
+    return SolvencyReport(~np.isnan(starts[:, 0]), starts, ends, width, worst * SECONDS_PER_YEAR, where)
+
+
+def separated_solvency(base_borrow_rate, low_slope_borrow, high_slope_borrow,
+                       base_supply_rate, low_slope_supply, high_slope_supply, u_optimal,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+    """Exact unsafe utilization intervals for many separated-model parameter sets.
+
+    The reserve spread `borrow_rate * U / 100 - supply_rate` is quadratic in
+    `U` on each side of the shared kink, so the intervals where it is
+    negative (suppliers are paid more than borrowers generate) come from its
+    roots rather than from sampling.  Arguments broadcast to `n` parameter
+    sets, processed `chunk_size` at a time; see `SolvencyReport`.
+    """
+    params = [np.asarray(value, dtype=float) for value in (
+        base_borrow_rate, low_slope_borrow, high_slope_borrow,
+        base_supply_rate, low_slope_supply, high_slope_supply, u_optimal)]
+    n, = np.broadcast_shapes(*(value.shape for value in params), (1,))
+    params = [np.broadcast_to(value, (n,)) for value in params]
+
+    regions = 3
+    report = SolvencyReport(np.empty(n, dtype=bool), np.empty((n, regions)), np.empty((n, regions)),
+                            np.empty(n), np.empty(n), np.empty(n))
+    for start in range(0, n, chunk_size):
+        part = slice(start, start + chunk_size)
+        base_b, low_b, high_b, base_s, low_s, high_s, kink = (value[part, None] for value in params)
+        kink = np.clip(kink, 0, 100)
+        low = np.concatenate((np.zeros_like(kink), kink), axis=1)
+        high = np.concatenate((kink, np.full_like(kink, 100.0)), axis=1)
+        # Intercept and slope of both curves on [0, kink] and (kink, 100]
+        borrow_slope = np.concatenate((low_b, high_b), axis=1)
+        borrow_intercept = np.concatenate((base_b, base_b + (low_b - high_b) * kink), axis=1)
+        supply_slope = np.concatenate((low_s, high_s), axis=1)
+        supply_intercept = np.concatenate((base_s, base_s + (low_s - high_s) * kink), axis=1)
+
+        chunk = _report(borrow_slope / 100, borrow_intercept / 100 - supply_slope, -supply_intercept,
+                        low, high, regions)
+        for out, values in zip(report, chunk):
+            out[part] = values
+    return report
+
+
+def separated_screen(base_borrow_rate, low_slope_borrow, high_slope_borrow,
+                     base_supply_rate, low_slope_supply, high_slope_supply, u_optimal,
+                     chunk_size=DEFAULT_CHUNK_SIZE):
+    """`separated_solvency` over the Cartesian product of the array arguments.
+
+    As with `rate_sweep.jump_rate_sweep`, every array argument becomes one
+    grid axis (in signature order); `starts` and `ends` keep a trailing
+    regions axis.
+    """
+    shape, grid = parameter_grid(base_borrow_rate=base_borrow_rate, low_slope_borrow=low_slope_borrow,
+                                 high_slope_borrow=high_slope_borrow, base_supply_rate=base_supply_rate,
+                                 low_slope_supply=low_slope_supply, high_slope_supply=high_slope_supply,
+                                 u_optimal=u_optimal)
+    report = separated_solvency(**grid, chunk_size=chunk_size)
+    return SolvencyReport(*(value.reshape(shape + value.shape[1:]) for value in report))
+
+
+def unsafe_regions(model):
+    """`(start, end)` utilization intervals where `model`'s reserve spread is negative.
+
+    Works for any `RateModel`: the pieces between `sampling.breakpoints`
+    are quadratic in utilization whether supply comes from a separate curve
+    or from the reserve factor.
+    """
+    points = breakpoints(model)
+    low, high = points[:-1], points[1:]
+    if not len(low):
+        return []
+    middle = (low + high) / 2
+    borrow_intercept, borrow_slope = model.borrow.coefficients(middle)
+    if model.min_rate is not None:
+        clamped = model.borrow(middle) < model.min_rate
+        borrow_intercept = np.where(clamped, model.min_rate, borrow_intercept)
+        borrow_slope = np.where(clamped, 0.0, borrow_slope)
+    if model.supply is not None:
+        supply_intercept, supply_slope = model.supply.coefficients(middle)
+        a = borrow_slope / 100
+        b = borrow_intercept / 100 - supply_slope
+        c = -supply_intercept
+    else:
+        # Spread = borrow * U / 100 * reserve factor
+        share = model.reserve_factor / 100.0 / 100
+        a, b, c = borrow_slope * share, borrow_intercept * share, np.zeros_like(middle)
+
+    regions = (3 * len(low) + 1) // 2
+    starts, ends = _negative_intervals(a[None], b[None], c[None], low[None], high[None], regions)
+    return [(float(start), float(end)) for start, end in zip(starts[0], ends[0]) if not np.isnan(start)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Screen separated-model parameter ranges for a negative reserve spread. "
+                    "Each parameter takes one value or START:STOP:COUNT for an even range.")
+    names = ('base_borrow_rate', 'low_slope_borrow', 'high_slope_borrow',
+             'base_supply_rate', 'low_slope_supply', 'high_slope_supply', 'u_optimal')
+    for name in names:
+        parser.add_argument('--' + name.replace('_', '-'), required=True)
+    args = parser.parse_args(argv)
+
+    def values(text):
+        if ':' not in text:
+            return float(text)
+        start, stop, count = text.split(':')
+        return np.linspace(float(start), float(stop), int(count))
+
+    report = separated_screen(**{name: values(getattr(args, name)) for name in names})
+    unsafe = np.asarray(report.unsafe)
+    print(f"{int(unsafe.sum())} of {unsafe.size} parameter sets pay suppliers more than borrowers generate")
+    if unsafe.any():
+        worst = np.unravel_index(np.argmin(report.worst_spread), np.shape(report.worst_spread))
+        print(f"worst spread {np.min(report.worst_spread):.4f}% APR at {report.worst_utilization[worst]:.2f}% "
+              f"utilization; widest unsafe range {np.max(report.unsafe_width):.2f} percentage points")
+    return 1 if unsafe.any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
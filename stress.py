@@ -0,0 +1,253 @@
+import argparse
+import csv
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rate_engine import SECONDS_PER_YEAR, RateModel, load_configs
+
+SECONDS_PER_DAY = 86400
+
+UtilizationProcess = namedtuple('UtilizationProcess', [
+    'mean',             # long-run utilization (%)
+    'reversion',        # pull towards `mean`, per day
+    'volatility',       # diffusion, percentage points per sqrt(day)
+    'jump_intensity',   # expected jumps per day
+    'jump_mean',        # average jump size (percentage points)
+    'jump_std',         # jump size standard deviation
+    'start',            # starting utilization (%), `mean` when None
+], defaults=(80.0, 1.0, 5.0, 0.05, 10.0, 5.0, None))
+
+METRICS = ('supply_apy', 'borrow_apy', 'reserves', 'time_above_kink')
+QUANTILES = (0.01, 0.05, 0.5, 0.95, 0.99)
+DEFAULT_BATCH_SIZE = 4096
+DEFAULT_BLOCK_STEPS = 256
+
+
+class OnlineStats:
+    """Streaming mean, variance, extremes and fixed-bin histogram of a metric.
+
+    Batches are folded in with `update` and partial results from other
+    processes with `merge` (Chan et al.'s pairwise update), so nothing but
+    the histogram is kept per value.  Quantiles are interpolated within the
+    histogram bins; values outside `edges` count towards the end bins.
+    """
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        if not len(values):
+            return self
+        batch = OnlineStats(self.edges)
+        batch.count = len(values)
+        batch.mean = values.mean()
+        batch.m2 = np.sum((values - batch.mean) ** 2)
+        batch.minimum, batch.maximum = values.min(), values.max()
+        batch.counts = np.histogram(np.clip(values, self.edges[0], self.edges[-1]), self.edges)[0]
+        return self.merge(batch)
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.counts += other.counts
+        return self
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+    def quantile(self, q):
+        cumulative = np.concatenate(([0], np.cumsum(self.counts))) / max(self.count, 1)
+        value = np.interp(q, cumulative, self.edges)
+        return np.clip(value, self.minimum, self.maximum)
+
+    def summary(self, quantiles=QUANTILES):
+        summary = {'count': self.count, 'mean': self.mean, 'std': self.std,
+                   'min': self.minimum, 'max': self.maximum}
+        for q in quantiles:
+            summary[f'p{q * 100:g}'] = float(self.quantile(q))
+        return summary
+
+
+def default_kink(model):
+    """Highest kink of the borrow curve inside (0, 100), or 100 when it has none."""
+    inner = model.borrow.breakpoints()[1:-1]
+    return float(inner.max()) if len(inner) else 100.0
+
+
+def metric_edges(model, years, bins=200):
+    """Histogram edges per metric, wide enough for any path through `model`."""
+    utilization = np.union1d(np.linspace(0, 100, 1001), model.borrow.breakpoints())
+    borrow_rates, supply_rates = model.rates(utilization)
+    # APRs in fractions per year; realized yields sit between the extremes
+    borrow_apr = borrow_rates * SECONDS_PER_YEAR / 100
+    supply_apr = supply_rates * SECONDS_PER_YEAR / 100
+    spread = borrow_apr * utilization / 100 - supply_apr
+    growth = np.exp(max(supply_apr.max(), 0) * years)
+
+    def edges(low, high):
+        if not high > low:
+            low, high = low - 0.5, high + 0.5
+        return np.linspace(low, high, bins + 1)
+
+    return {
+        'supply_apy': edges(np.expm1(supply_apr.min()) * 100, np.expm1(supply_apr.max()) * 100),
+        'borrow_apy': edges(np.expm1(borrow_apr.min()) * 100, np.expm1(borrow_apr.max()) * 100),
+        'reserves': edges(min(spread.min(), 0) * years * growth, max(spread.max(), 0) * years * growth),
+        'time_above_kink': edges(0.0, 1.0),
+    }
+
+
+def simulate_paths(model, process, paths, steps, dt, kink, rng, block_steps=DEFAULT_BLOCK_STEPS):
+    """Per-path metrics for `paths` utilization paths of `steps` steps of `dt` seconds.
+
+    Utilization follows an Ornstein-Uhlenbeck process, discretized exactly,
+    plus compound Poisson jumps, clipped to [0, 100].  Paths advance together
+    in blocks of `block_steps`, so memory is `paths * block_steps` values.
+    Rates accrue as in `accrual.simulate_accrual`.
+    """
+    days = dt / SECONDS_PER_DAY
+    decay = np.exp(-process.reversion * days)
+    if process.reversion:
+        noise_scale = process.volatility * np.sqrt((1 - decay ** 2) / (2 * process.reversion))
+    else:
+        noise_scale = process.volatility * np.sqrt(days)
+
+    utilization = np.full(paths, process.mean if process.start is None else process.start, dtype=float)
+    log_borrow = np.zeros(paths)
+    log_supply = np.zeros(paths)
+    reserves = np.zeros(paths)
+    above = np.zeros(paths, dtype=np.int64)
+    # Time-major blocks, so each step reads and writes one contiguous row
+    block = np.empty((min(block_steps, steps), paths))
+
+    for start in range(0, steps, len(block)):
+        width = min(len(block), steps - start)
+        shocks = rng.standard_normal((width, paths)) * noise_scale
+        # A Poisson total scattered uniformly is a Poisson count per step and path,
+        # without drawing one for every cell when jumps are rare
+        jumps = rng.poisson(process.jump_intensity * days * shocks.size)
+        cells = rng.integers(0, shocks.size, jumps)
+        np.add.at(shocks.reshape(-1), cells, rng.normal(process.jump_mean, process.jump_std, jumps))
+
+        # Rates of each step apply the utilization at its start
+        for t in range(width):
+            block[t] = utilization
+            utilization = process.mean + (utilization - process.mean) * decay + shocks[t]
+            np.clip(utilization, 0, 100, out=utilization)
+
+        path = block[:width]
+        borrow_rates, supply_rates = model.rates(path)
+        borrow_growth = np.log1p(borrow_rates / 100 * dt)
+        supply_growth = np.log1p(supply_rates / 100 * dt)
+        supply_path = np.cumsum(supply_growth, axis=0) + log_supply
+        # Supply balance at the start of each step, per unit of initial supply
+        balance = np.exp(supply_path - supply_growth)
+        reserves += np.sum(balance * (borrow_rates * path / 100 - supply_rates), axis=0) / 100 * dt
+        log_borrow += borrow_growth.sum(axis=0)
+        log_supply = supply_path[-1]
+        above += np.count_nonzero(path > kink, axis=0)
+
+    years = steps * dt / SECONDS_PER_YEAR
+    return {
+        'supply_apy': np.expm1(log_supply / years) * 100,
+        'borrow_apy': np.expm1(log_borrow / years) * 100,
+        'reserves': reserves,
+        'time_above_kink': above / steps,
+    }
+
+
+def _stress_task(task):
+    model, process, paths, steps, dt, kink, seed, block_steps, edges = task
+    metrics = simulate_paths(model, process, paths, steps, dt, kink, np.random.default_rng(seed), block_steps)
+    return {name: OnlineStats(edges[name]).update(values) for name, values in metrics.items()}
+
+
+def simulate_stress(model, paths=10_000, steps=10_000, dt=3600.0, process=UtilizationProcess(), kink=None,
+                    batch_size=DEFAULT_BATCH_SIZE, block_steps=DEFAULT_BLOCK_STEPS, workers=None, seed=None,
+                    bins=200):
+    """Monte Carlo distribution of yields, reserves and kink exposure for `model`.
+
+    `paths` utilization paths are simulated in batches of `batch_size`
+    spread over a process pool of `workers` (in this process when
+    `workers=1`); each batch is reduced to `OnlineStats` before it is
+    returned, so peak memory is independent of `paths`.  Batches draw from
+    independent streams spawned from `seed`, so results do not depend on the
+    number of workers.  Returns a dict of `OnlineStats` keyed by `METRICS`:
+    realized supplier and borrower APY (%), reserves per unit of initial
+    supply and the fraction of time above `kink` (default `default_kink`).
+    """
+    kink = default_kink(model) if kink is None else kink
+    edges = metric_edges(model, steps * dt / SECONDS_PER_YEAR, bins)
+    sizes = [min(batch_size, paths - start) for start in range(0, paths, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = ((model, process, size, steps, dt, kink, batch_seed, block_steps, edges)
+             for size, batch_seed in zip(sizes, seeds))
+
+    stats = {name: OnlineStats(edges[name]) for name in METRICS}
+    if workers == 1:
+        _merge_into(stats, map(_stress_task, tasks))
+        return stats
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        _merge_into(stats, pool.map(_stress_task, tasks))
+    return stats
+
+
+def _merge_into(stats, results):
+    for result in results:
+        for name in METRICS:
+            stats[name].merge(result[name])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo stress test of rate models under random utilization.")
+    parser.add_argument('config', help="JSON or YAML file with model configs")
+    parser.add_argument('--paths', type=int, default=10_000)
+    parser.add_argument('--steps', type=int, default=10_000)
+    parser.add_argument('--dt', type=float, default=3600.0, help="step length in seconds")
+    parser.add_argument('--mean', type=float, default=80.0, help="long-run utilization (%%)")
+    parser.add_argument('--reversion', type=float, default=1.0, help="mean reversion per day")
+    parser.add_argument('--volatility', type=float, default=5.0, help="percentage points per sqrt(day)")
+    parser.add_argument('--jump-intensity', type=float, default=0.05, help="expected jumps per day")
+    parser.add_argument('--jump-mean', type=float, default=10.0)
+    parser.add_argument('--jump-std', type=float, default=5.0)
+    parser.add_argument('--start', type=float, default=None, help="starting utilization (%%)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    process = UtilizationProcess(args.mean, args.reversion, args.volatility, args.jump_intensity,
+                                 args.jump_mean, args.jump_std, args.start)
+    writer = None
+    for i, config in enumerate(load_configs(args.config)):
+        stats = simulate_stress(RateModel.from_config(config), args.paths, args.steps, args.dt, process,
+                                batch_size=args.batch_size, workers=args.workers, seed=args.seed)
+        name = config.get('name', f"model-{i}")
+        for metric in METRICS:
+            summary = stats[metric].summary()
+            if writer is None:
+                writer = csv.writer(sys.stdout)
+                writer.writerow(['model', 'metric'] + list(summary))
+            writer.writerow([name, metric] + list(summary.values()))
+
+
+if __name__ == "__main__":
+    main()
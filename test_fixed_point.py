@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from fixed_point import (RAY, WAD, FixedPointModel, _add, _div_pow10, _ints_to_limbs, _less, _limbs_to_ints,
+                         _mul, _shortest_decimals, _sub, to_fixed)
+
+
+def reference_rates(utilization, base_rate, kinks, slopes, reserve_factor, scale):
+    # Compound's JumpRateModel in plain Python ints; a point on a kink stays below it
+    starts = [0] + kinks
+    segment = sum(kink < utilization for kink in kinks)
+    borrow = base_rate + sum((starts[j + 1] - starts[j]) * slopes[j] // scale for j in range(segment))
+    borrow += (utilization - starts[segment]) * slopes[segment] // scale
+    supply = utilization * (borrow * (scale - reserve_factor) // scale) // scale
+    return borrow, supply
+
+
+def params(scale):
+    # 3-slope defaults of the Tk app, as integers at `scale`
+    kinks = [to_fixed(Decimal('0.05'), scale), to_fixed(Decimal('0.85'), scale)]
+    slopes = [0, to_fixed(1.585489599e-7, scale), to_fixed(3.4563673262e-6, scale)]
+    return to_fixed(Decimal('1e-10'), scale), kinks, slopes, to_fixed(Decimal('0.05'), scale)
+
+
+@pytest.mark.parametrize('scale', [WAD, RAY])
+def test_rates_match_integer_reference(scale):
+    base_rate, kinks, slopes, reserve_factor = params(scale)
+    fixed = FixedPointModel(base_rate, kinks, slopes, reserve_factor, scale=scale)
+    rng = np.random.default_rng(0)
+    points = [0, scale] + kinks + [kink - 1 for kink in kinks] + [kink + 1 for kink in kinks]
+    points += [int(value) * (scale // WAD) for value in rng.integers(0, WAD, 200, dtype=np.int64)]
+
+    borrow, supply = fixed.rates(np.array(points, dtype=object))
+    expected = [reference_rates(u, base_rate, kinks, slopes, reserve_factor, scale) for u in points]
+    assert [int(b) for b in borrow] == [b for b, _ in expected]
+    assert [int(s) for s in supply] == [s for _, s in expected]
+
+
+@pytest.mark.parametrize('scale', [WAD, RAY])
+def test_float_utilization_is_read_as_its_decimal(scale):
+    base_rate, kinks, slopes, reserve_factor = params(scale)
+    fixed = FixedPointModel(base_rate, kinks, slopes, reserve_factor, scale=scale)
+    rng = np.random.default_rng(1)
+    # Exactly on the kinks, short decimals and full-precision floats
+    points = np.concatenate(([0.0, 5.0, 85.0, 100.0, 63.7, 0.1, 99.99999999999999, 1e-7],
+                             np.round(rng.uniform(0, 100, 200), 3), rng.uniform(0, 100, 200)))
+
+    borrow, supply = fixed.rates(points)
+    for u, b, s in zip(points.tolist(), borrow, supply):
+        expected = reference_rates(to_fixed(Decimal(repr(u)) / 100, scale), base_rate, kinks, slopes,
+                                   reserve_factor, scale)
+        assert (int(b), int(s)) == expected, u
+
+
+def test_kink_point_stays_in_lower_segment():
+    for scale in (WAD, RAY):
+        base_rate, kinks, slopes, reserve_factor = params(scale)
+        fixed = FixedPointModel(base_rate, kinks, slopes, reserve_factor, scale=scale)
+        assert int(fixed.rates(85.0)[0]) == int(fixed.rates(np.array([kinks[1]], dtype=object))[0][0])
+
+
+def test_shortest_decimals_match_repr():
+    rng = np.random.default_rng(2)
+    values = np.concatenate((rng.uniform(0, 100, 10_000), np.round(rng.uniform(0, 100, 1_000), 4),
+                             2.0 ** np.arange(-20, 7), np.nextafter(2.0 ** np.arange(-20, 7), 0)))
+    digits, places = _shortest_decimals(values)
+    assert np.mean(places >= 0) > 0.9
+    for value, d, p in zip(values.tolist(), digits.tolist(), places.tolist()):
+        if p >= 0:
+            assert Decimal(d).scaleb(-p) == Decimal(repr(value))
+
+
+def test_limb_arithmetic_matches_python_ints():
+    rng = np.random.default_rng(3)
+
+    def random_ints(bits, n=500):
+        return [int.from_bytes(rng.bytes(bits // 8), 'little') >> int(rng.integers(0, bits)) for _ in range(n)]
+
+    def limbs(values):
+        return _ints_to_limbs(np.array(values, dtype=object))
+
+    def ints(limbs):
+        return [int(v) for v in np.asarray(_limbs_to_ints(limbs), dtype=object)]
+
+    a, b = random_ints(255), random_ints(255)
+    high, low = [max(x, y) for x, y in zip(a, b)], [min(x, y) for x, y in zip(a, b)]
+    assert ints(_add(limbs(a), limbs(b))) == [x + y for x, y in zip(a, b)]
+    assert ints(_sub(limbs(high), limbs(low))) == [x - y for x, y in zip(high, low)]
+    assert list(_less(limbs(a), limbs(b))) == [x < y for x, y in zip(a, b)]
+
+    c, d = random_ints(128), random_ints(128)
+    assert ints(_mul(limbs(c), limbs(d))) == [x * y for x, y in zip(c, d)]
+    for exponent in (1, 13, 18, 27, 40):
+        assert ints(_div_pow10(limbs(a), exponent)) == [x // 10 ** exponent for x in a]
+
+    with pytest.raises(OverflowError):
+        _mul(limbs([1 << 200]), limbs([1 << 100]))
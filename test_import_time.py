@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from check_import_time import CORE_MODULES, DEFAULT_BUDGET_MS, measure
+
+
+@pytest.mark.parametrize('module', CORE_MODULES)
+def test_core_module_import_budget(module, monkeypatch):
+    # The child interpreters import from the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    elapsed, heavy = measure(module)
+    assert heavy == []
+    assert elapsed is not None
+    assert elapsed <= DEFAULT_BUDGET_MS
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+
+import numpy as np
+
+_DISABLED = nullcontext()
+
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class PhaseTimer:
+    """Opt-in wall-clock timings of named phases, with rolling percentiles.
+
+    `with timer.phase('sample'):` times a block; phases may nest.  While
+    `enabled` is false `phase` hands back one shared no-op context manager
+    and `record` returns at once, so instrumented code pays a method call
+    per phase.  The last `history` durations of each phase feed `stats`;
+    up to `max_events` spans are kept for `export_chrome_trace`.
+    """
+
+    def __init__(self, enabled=False, history=200, max_events=100_000):
+        self.enabled = enabled
+        self.history = history
+        self.origin = time.perf_counter()
+        self.latest = {}
+        self.durations = defaultdict(lambda: deque(maxlen=self.history))
+        self.events = deque(maxlen=max_events)
+
+    def phase(self, name):
+        if not self.enabled:
+            return _DISABLED
+        return _Phase(self, name)
+
+    def record(self, name, start, end):
+        """Add a span measured elsewhere, as `time.perf_counter()` readings."""
+        if not self.enabled:
+            return
+        duration = end - start
+        self.latest[name] = duration
+        self.durations[name].append(duration)
+        self.events.append((name, start, duration, threading.get_ident()))
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.latest.clear()
+        self.durations.clear()
+        self.events.clear()
+
+    def stats(self, percentiles=(50, 95)):
+        """`{phase: {'latest': s, 'p50': s, 'p95': s, 'count': n}}`, in first-seen order."""
+        stats = {}
+        for name, durations in self.durations.items():
+            values = np.percentile(np.fromiter(durations, float, len(durations)), percentiles)
+            stats[name] = {'latest': self.latest[name], 'count': len(durations)}
+            for p, value in zip(percentiles, values):
+                stats[name][f'p{p}'] = float(value)
+        return stats
+
+    def format_status(self, total, phases):
+        """One status-bar line: `total` with rolling percentiles, then the latest of each of `phases`."""
+        stats = self.stats()
+        if total not in stats:
+            return ""
+        summary = stats[total]
+        parts = [f"{name} {stats[name]['latest'] * 1000:.1f}" for name in phases if name in stats]
+        return (f"{total} {summary['latest'] * 1000:.1f} ms (p50 {summary['p50'] * 1000:.1f}, "
+                f"p95 {summary['p95'] * 1000:.1f}) | " + ", ".join(parts))
+
+    def chrome_trace(self):
+        """Recorded spans as a Chrome trace (`chrome://tracing`, Perfetto) dictionary."""
+        pid = os.getpid()
+        events = [{'name': name, 'cat': 'phase', 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self.origin) * 1e6, 'dur': duration * 1e6}
+                  for name, start, duration, tid in self.events]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
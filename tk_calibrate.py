@@ -0,0 +1,83 @@
+import math
+import tkinter as tk
+from tkinter import messagebox, ttk
+
+from calibration import UNDETERMINED, calibrate, parse_targets
+
+
+class CalibrationDialog:
+    """Window that fits a model to target APRs and writes the result into the app's fields.
+
+    `fields` maps the keyword arguments returned by `calibration.calibrate`
+    to the app's `DoubleVar`s; kinks come from the same variables unless
+    "Fit Kinks" is ticked.  `on_apply` runs after the fields are updated.
+    """
+
+    def __init__(self, root, model, fields, kinks, on_apply):
+        self.model = model
+        self.fields = fields
+        self.kinks = kinks
+        self.on_apply = on_apply
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Calibrate to Target APRs")
+        self.window.transient(root)
+
+        ttk.Label(self.window, text="Borrow Targets (U%:APR%, ...)").grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.borrow_targets = tk.StringVar(value="80:4, 100:60")
+        ttk.Entry(self.window, textvariable=self.borrow_targets, width=30).grid(row=0, column=1, padx=10, pady=5, sticky="ew")
+
+        ttk.Label(self.window, text="Supply Targets (U%:APR%, ...)").grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.supply_targets = tk.StringVar(value="")
+        ttk.Entry(self.window, textvariable=self.supply_targets, width=30).grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+
+        self.fit_base = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.window, text="Fit Base Rate", variable=self.fit_base).grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        self.fit_kinks = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.window, text="Fit Kinks", variable=self.fit_kinks).grid(row=2, column=1, padx=10, pady=5, sticky="w")
+
+        self.result_label = ttk.Label(self.window, text="")
+        self.result_label.grid(row=3, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+
+        button_frame = ttk.Frame(self.window)
+        button_frame.grid(row=4, column=0, columnspan=2, pady=10)
+        ttk.Button(button_frame, text="Apply", command=self.apply).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Close", command=self.window.destroy).pack(side=tk.LEFT, padx=5)
+
+        self.window.grid_columnconfigure(1, weight=1)
+
+    def apply(self):
+        try:
+            borrow_u, borrow_apr = parse_targets(self.borrow_targets.get())
+            supply_u, supply_apr = parse_targets(self.supply_targets.get())
+        except ValueError:
+            messagebox.showerror("Calibrate", "Targets must look like 80:4, 100:60", parent=self.window)
+            return
+        if not borrow_u and not supply_u:
+            return
+
+        fixed = {}
+        if not self.fit_base.get():
+            fixed['base_rate'] = self.fields.get('base_rate', self.fields.get('base_borrow_rate')).get()
+            if 'base_supply_rate' in self.fields:
+                fixed['supply_base_rate'] = self.fields['base_supply_rate'].get()
+        if 'reserve_factor' in self.fields:
+            fixed['reserve_factor'] = self.fields['reserve_factor'].get()
+        kinks = None if self.fit_kinks.get() else [self.fields[name].get() for name in self.kinks]
+
+        try:
+            params = calibrate(self.model, borrow_u + supply_u, borrow_apr + supply_apr,
+                               side=['borrow'] * len(borrow_u) + ['supply'] * len(supply_u), kinks=kinks, **fixed)
+        except ValueError as error:
+            self.result_label.config(text=str(error))
+            return
+        if math.isnan(params['rms_error']):
+            self.result_label.config(text=UNDETERMINED)
+            return
+        for name, value in params.items():
+            # A separated curve without targets of its own stays as it was
+            untouched = ('supply' in name and not supply_u) or ('borrow' in name and not borrow_u)
+            if name in self.fields and not untouched:
+                self.fields[name].set(value)
+        self.result_label.config(text=f"RMS error: {params['rms_error']:.4f} APR points")
+        self.on_apply()
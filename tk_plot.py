@@ -0,0 +1,137 @@
+import time
+import tkinter as tk
+from tkinter import filedialog, ttk
+
+from timing import PhaseTimer
+
+# Phases of update_plot shown in the status bar, in order
+PHASES = ('read_vars', 'model', 'sample', 'plot', 'cursor', 'shade', 'render')
+
+
+class CurvePlot:
+    """Borrow/supply line pair that is updated in place between redraws.
+
+    The `Line2D` artists, title, legend and hover cursor are created once;
+    later calls to `draw` only swap the line data and ask the canvas for an
+    idle redraw.  `schedule` coalesces bursts of slider events so only the
+    latest one is rendered.  `timer` is the apps' opt-in `PhaseTimer`; the
+    canvas render is recorded from `draw_idle` to the next `draw_event`.
+    """
+
+    def __init__(self, root, ax, canvas, on_hover, delay_ms=15):
+        self.root = root
+        self.ax = ax
+        self.canvas = canvas
+        self.on_hover = on_hover
+        self.delay_ms = delay_ms
+
+        self.borrow_line = None
+        self.supply_line = None
+        self.cursor = None
+        self.spans = []
+
+        self.timer = PhaseTimer()
+        self.show_latency = None
+        self.profile = None
+        self.latency_label = None
+        self.last_latency = None
+        self._pending = None
+        self._draw_started = None
+        self._render_started = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def create_status_bar(self, row):
+        status_frame = ttk.Frame(self.root)
+        status_frame.grid(row=row, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="ew")
+
+        self.show_latency = tk.BooleanVar(value=False)
+
+        ttk.Checkbutton(status_frame, text="Show Redraw Latency", variable=self.show_latency,
+                        command=self._update_latency_label).pack(side=tk.LEFT)
+
+        self.profile = tk.BooleanVar(value=False)
+        ttk.Checkbutton(status_frame, text="Profile Phases", variable=self.profile,
+                        command=self._toggle_profile).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(status_frame, text="Export Trace...", command=self.export_trace).pack(side=tk.LEFT, padx=(10, 0))
+        self.latency_label = ttk.Label(status_frame, text="")
+        self.latency_label.pack(side=tk.RIGHT)
+
+    def schedule(self, callback):
+        if self._pending is not None:
+            self.root.after_cancel(self._pending)
+        self._pending = self.root.after(self.delay_ms, self._run_scheduled, callback)
+
+    def _run_scheduled(self, callback):
+        self._pending = None
+        callback()
+
+    def _toggle_profile(self):
+        self.timer.enabled = self.profile.get()
+        self._update_latency_label()
+
+    def export_trace(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if path:
+            self.timer.export_chrome_trace(path)
+
+    def draw(self, utilization, borrow_rates, supply_rates):
+        self._draw_started = time.perf_counter()
+
+        if self.borrow_line is None:
+            with self.timer.phase('plot'):
+                self.ax.clear()
+                self.borrow_line, = self.ax.plot(utilization, borrow_rates, '-b', label='Borrow Rate')
+                self.supply_line, = self.ax.plot(utilization, supply_rates, '-r', label='Supply Rate')
+                self.ax.set_title('Borrow and Supply Rates')
+                self.ax.set_xlabel('Utilization (%)')
+                self.ax.set_ylabel('Rate (per unit of time)')
+                self.ax.legend()
+
+            # Add mplcursors to enable hover; loaded on first plot to keep startup fast
+            with self.timer.phase('cursor'):
+                import mplcursors
+
+                self.cursor = mplcursors.cursor([self.borrow_line, self.supply_line])
+                self.cursor.connect("add", self.on_hover)
+        else:
+            with self.timer.phase('plot'):
+                self.borrow_line.set_data(utilization, borrow_rates)
+                self.supply_line.set_data(utilization, supply_rates)
+                self.ax.relim()
+                self.ax.autoscale_view()
+
+        self._render_started = time.perf_counter()
+        self.canvas.draw_idle()
+        return self.borrow_line, self.supply_line
+
+    def shade(self, regions, label):
+        """Replace the shaded utilization intervals with `regions`, a list of `(start, end)`."""
+        if not regions and not self.spans:
+            return
+        with self.timer.phase('shade'):
+            for span in self.spans:
+                span.remove()
+            self.spans = [self.ax.axvspan(start, end, color='red', alpha=0.15, linewidth=0,
+                                          label=label if i == 0 else None)
+                          for i, (start, end) in enumerate(regions)]
+            self.ax.legend()
+            self.canvas.draw_idle()
+
+    def _on_draw(self, event):
+        if self._draw_started is None:
+            return
+        now = time.perf_counter()
+        self.last_latency = now - self._draw_started
+        self.timer.record('render', self._render_started, now)
+        self._draw_started = self._render_started = None
+        self._update_latency_label()
+
+    def _update_latency_label(self):
+        if self.latency_label is None:
+            return
+        if self.timer.enabled:
+            self.latency_label.config(text=self.timer.format_status('update_plot', PHASES))
+        elif self.show_latency.get() and self.last_latency is not None:
+            self.latency_label.config(text=f"Redraw: {self.last_latency * 1000:.1f} ms")
+        else:
+            self.latency_label.config(text="")